@@ -0,0 +1,3 @@
+Add ``plone.rfc822.batch.constructMessages()``, which constructs messages for
+many objects at once, formatting numeric, date and time fields column-wise.
+[plone devs]
@@ -0,0 +1,3 @@
+Add optional ``gzip``/``deflate`` compression of primary payloads above a size threshold to ``constructMessage()``, marked with a ``Content-Encoding`` header.
+``initializeObject()`` decompresses such payloads transparently.
+[plone devs]
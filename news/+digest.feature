@@ -0,0 +1,3 @@
+Add an optional ``digest`` argument to ``constructMessage()`` to compute per-payload ``Content-Digest`` and whole-message ``Message-Digest`` headers while the message is built.
+``initializeObject()`` accepts a stored digest and returns early when the message is unchanged.
+[plone devs]
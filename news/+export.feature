@@ -0,0 +1,2 @@
+Add ``plone.rfc822.export``, which exports the messages of many objects to sharded mbox files. Progress is checkpointed, so an interrupted export resumes after the last committed message, and shards can be exported in parallel processes. ``mboxMessages()`` gets an ``mboxrd`` option to read these files back.
+[plone devs]
@@ -0,0 +1,3 @@
+Encode non-ASCII and multi-line header values with a faster, byte-for-byte
+compatible replacement for ``email.header.Header``.
+[plone devs]
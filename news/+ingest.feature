@@ -0,0 +1,3 @@
+Add ``plone.rfc822.ingest`` to initialise objects in bulk from mbox files
+and Maildir directories, parsing messages in a pool of workers.
+[plone devs]
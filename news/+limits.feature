@@ -0,0 +1,2 @@
+Add ``plone.rfc822.limits`` with ``ParseLimits`` budgets for headers, payloads and parts, enforced by ``parseMessage()`` while reading and by ``initializeObject()`` before demarshalling.
+[plone devs]
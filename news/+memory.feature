@@ -0,0 +1,2 @@
+Use much less memory for binary payloads: base64 payloads are now encoded in chunks and decoded in one go. Peak memory drops from about 7.8 to 2.7 times the payload size when constructing a message, and from 6.2 to 1.0 times when initialising an object from it.
+[plone devs]
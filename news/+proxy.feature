@@ -0,0 +1,3 @@
+Add ``plone.rfc822.proxy.MessageProxy``, a read-only object providing a
+schema, which decodes the fields of a message only when they are read.
+[plone devs]
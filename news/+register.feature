@@ -0,0 +1,2 @@
+Add ``plone.rfc822.defaultfields.registerDefaultMarshalers()``, which registers the default field marshalers without loading ZCML. ``configure.zcml`` now registers them through the new ``<rfc822:defaultMarshalers />`` directive, from the same ``DEFAULT_MARSHALERS`` table.
+[plone devs]
@@ -0,0 +1,5 @@
+Field marshalers now use ``__slots__``, bind their field lazily and provide
+``IStatelessFieldMarshaler``, whose ``marshalValue()`` and ``encodeValue()``
+return the ASCII flag instead of setting the ``ascii`` attribute. Message
+construction uses these when available.
+[plone devs]
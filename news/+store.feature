@@ -0,0 +1,4 @@
+Add a ``store`` option to ``constructMessage()`` and ``initializeObject()``,
+which keeps identical binary payloads only once, in a mapping, and refers to
+them from the message.
+[plone devs]
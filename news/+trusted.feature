@@ -0,0 +1,3 @@
+Add a ``trusted`` mode to ``initializeObject()`` which sets values without validating them again, e.g. when restoring backups.
+Skipped validations are counted in ``plone.rfc822.defaultfields.skippedValidations``.
+[plone devs]
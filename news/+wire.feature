@@ -0,0 +1,2 @@
+Add ``plone.rfc822.wire``, a compact length-prefixed binary format built from the same field marshalers as ``constructMessage()``, with conversion to and from RFC 822 messages.
+[plone devs]
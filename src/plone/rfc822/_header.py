@@ -0,0 +1,109 @@
+"""Fast RFC 2047 encoding of header values.
+
+``email.header.Header`` finds the folding points of an encoded header by
+re-encoding the whole current line for every character it adds, which is
+quadratic in the length of the value. ``EncodedHeader`` produces exactly the
+same output for the single-charset values built by ``constructMessage()``,
+but computes the encoded length of each character once.
+"""
+
+from bisect import bisect_right
+from email import base64mime
+from email import quoprimime
+from email.charset import SHORTEST
+from email.header import Header
+from itertools import accumulate
+
+import re
+
+# Length of the RFC 2047 chrome, "=?" charset "?q?" ... "?="
+RFC2047_CHROME_LEN = 7
+
+# Characters str.splitlines() splits on. Header starts a new line for each,
+# which we leave to the stdlib implementation.
+_LINEBREAKS = re.compile("[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# Length of each octet in the "Q" encoding, as an octet
+_Q_LENGTHS = bytes(len(quoprimime._QUOPRI_HEADER_MAP[octet]) for octet in range(256))
+
+# The longest a single character can get: four UTF-8 octets, Q encoded
+_MAX_CHAR_LEN = 12
+
+_UTF8_CODECS = ("utf-8", "utf8")
+
+
+def _character_boundary(data, end):
+    """Move ``end`` back to the start of the UTF-8 sequence it points into"""
+    while end < len(data) and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return end
+
+
+def _encode_words(data, charset, maxlinelen):
+    """Encode the UTF-8 encoded ``data`` into a list of encoded words, one for
+    each line.
+
+    This mirrors ``Charset.header_encode_lines()``: every line holds as many
+    characters as fit, the first line is ``maxlinelen`` long and continuation
+    lines are one shorter to leave room for the folding whitespace.
+    """
+    extra = len(charset) + RFC2047_CHROME_LEN
+    qpLengths = data.translate(_Q_LENGTHS)
+    base64Length = base64mime.header_length(data)
+    qpLength = sum(qpLengths)
+    if base64Length < qpLength:
+        encoder = base64mime.header_encode
+        length = base64Length
+    else:
+        encoder = quoprimime.header_encode
+        length = qpLength
+
+    maxlen = maxlinelen - extra
+    if length <= maxlen:
+        # Short values fit on a single line
+        return [encoder(data, charset)]
+
+    if encoder is quoprimime.header_encode:
+        # offsets[i] is the encoded length of data[:i]
+        offsets = list(accumulate(qpLengths, initial=0))
+
+    lines = []
+    start = 0
+    while start < len(data):
+        if encoder is quoprimime.header_encode:
+            end = bisect_right(offsets, offsets[start] + maxlen) - 1
+        else:
+            end = start + maxlen // 4 * 3
+        end = _character_boundary(data, end)
+        lines.append(encoder(data[start:end], charset))
+        start = end
+        maxlen = maxlinelen - 1 - extra
+    return lines
+
+
+class EncodedHeader(Header):
+    """A drop-in replacement for ``Header(value, charset)``.
+
+    Values in a UTF-8 charset are encoded by ``_encode_words()``, anything
+    else is left to ``email.header.Header``.
+    """
+
+    def encode(self, splitchars=";, \t", maxlinelen=None, linesep="\n"):
+        if maxlinelen is None:
+            maxlinelen = self._maxlinelen
+        if maxlinelen == 0:
+            maxlinelen = 1000000
+        if len(self._chunks) != 1 or self._headerlen or self._continuation_ws != " ":
+            return super().encode(splitchars, maxlinelen, linesep)
+        value, charset = self._chunks[0]
+        outputCharset = charset.get_output_charset()
+        if (
+            not value
+            or charset.header_encoding != SHORTEST
+            or charset.output_codec not in _UTF8_CODECS
+            or maxlinelen - 1 - len(outputCharset) - RFC2047_CHROME_LEN < _MAX_CHAR_LEN
+            or _LINEBREAKS.search(value) is not None
+        ):
+            return super().encode(splitchars, maxlinelen, linesep)
+        lines = _encode_words(value.encode("utf-8"), outputCharset, maxlinelen)
+        return (linesep + " ").join(lines)
@@ -5,19 +5,53 @@ import these from plone.rfc822 directly, not from this module.
 See interfaces.py for details.
 """
 
-from email.encoders import encode_base64
+from base64 import encodebytes
+from base64 import MAXBINSIZE
 from email.header import decode_header
-from email.header import Header
 from email.message import Message
+from plone.rfc822._header import EncodedHeader
 from plone.rfc822.interfaces import IFieldMarshaler
 from plone.rfc822.interfaces import IPrimaryField
+from plone.rfc822.interfaces import IStatelessFieldMarshaler
+from plone.rfc822.interfaces import ITrustedFieldMarshaler
+from plone.rfc822.limits import PayloadTooLarge
 from zope.component import queryMultiAdapter
 from zope.schema import getFieldsInOrder
 
+import binascii
+import gzip
+import hashlib
 import logging
+import struct
+import zlib
 
 logger = logging.getLogger("plone.rfc822")
 
+# Headers used to carry content digests, see ``constructMessage()``
+CONTENT_DIGEST_HEADER = "Content-Digest"
+MESSAGE_DIGEST_HEADER = "Message-Digest"
+
+# Header used to mark compressed payloads, see ``constructMessage()``
+CONTENT_ENCODING_HEADER = "Content-Encoding"
+
+# Binary payloads kept in a store are replaced by a reference of this type,
+# see ``constructMessage()``
+EXTERNAL_BODY_TYPE = "message/external-body"
+STORE_ACCESS_TYPE = "x-plone-rfc822-store"
+STORE_DIGEST = "sha256"
+
+# Headers which are not covered by the ``Message-Digest``
+_UNHASHED_HEADERS = frozenset(
+    header.lower() for header in (CONTENT_DIGEST_HEADER, MESSAGE_DIGEST_HEADER)
+)
+
+# Size of the chunks fed to the decompressor when reading a payload
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+# Size of the chunks base64 encoded at a time. This is a whole number of
+# lines, so that the lines are the same as when encoding in one go.
+BASE64_CHUNK_SIZE = MAXBINSIZE * 1024
+
 
 def safe_native_string(value, encoding="utf8"):
     """Try to convert value into a native string"""
@@ -28,21 +62,213 @@ def safe_native_string(value, encoding="utf8"):
     return value
 
 
-def constructMessageFromSchema(context, schema, charset="utf-8"):
-    return constructMessage(context, getFieldsInOrder(schema), charset)
+def _as_bytes(value, charset):
+    if isinstance(value, bytes):
+        return value
+    return value.encode(charset or "utf-8")
+
+
+def _encode_base64(payload, value):
+    """Set the base64 encoding of the bytes ``value`` as the payload.
+
+    This does what ``email.encoders.encode_base64()`` does, but encodes the
+    value in chunks, which avoids several full size intermediate copies.
+    """
+    chunks = []
+    view = memoryview(value)
+    for start in range(0, len(view), BASE64_CHUNK_SIZE):
+        chunk = encodebytes(view[start : start + BASE64_CHUNK_SIZE])
+        chunks.append(chunk.decode("ascii"))
+    payload.set_payload("".join(chunks))
+    payload["Content-Transfer-Encoding"] = "base64"
+
+
+def _decoded_payload(payload):
+    """Return ``payload.get_payload(decode=True)``.
+
+    Base64 payloads are decoded directly, rather than line by line as the
+    email package does, unless they are malformed.
+    """
+    # get_payload() would copy the value to check it for surrogates, which
+    # a2b_base64() rejects anyway
+    value = payload._payload
+    cte = str(payload.get("Content-Transfer-Encoding", "")).lower()
+    if isinstance(value, str) and cte == "base64":
+        try:
+            return binascii.a2b_base64(value)
+        except (binascii.Error, ValueError):
+            pass
+    return payload.get_payload(decode=True)
+
+
+def _format_digest(hasher):
+    return f"{hasher.name}={hasher.hexdigest()}"
+
+
+def _digest_matches(message, digest):
+    """Whether ``message`` carries the ``Message-Digest`` ``digest``.
+
+    The header is longer than a line, so it is folded when the message is
+    rendered. Whitespace is ignored, so that a parsed message matches too.
+    """
+    value = message.get(MESSAGE_DIGEST_HEADER)
+    if value is None:
+        return False
+    return "".join(str(value).split()) == "".join(str(digest).split())
+
+
+def _hash_record(hasher, kind, name, value):
+    """Feed a length-prefixed ``(kind, name, value)`` record to ``hasher``,
+    so that different sequences of records cannot give the same input.
+    """
+    name = name.encode("utf-8", "surrogateescape")
+    value = str(value).encode("utf-8", "surrogateescape")
+    hasher.update(kind)
+    hasher.update(struct.pack(">I", len(name)))
+    hasher.update(name)
+    hasher.update(struct.pack(">Q", len(value)))
+    hasher.update(value)
+
+
+def _hash_part(hasher, name, part_digest, payload, start=0):
+    """Feed the digest of a primary payload, and the headers of its part
+    from index ``start`` on, to ``hasher``. The multipart boundary and the
+    digest headers are left out.
+    """
+    _hash_record(hasher, b"P", name, part_digest)
+    for header, value in payload.items()[start:]:
+        lower = header.lower()
+        if lower in _UNHASHED_HEADERS:
+            continue
+        if lower == "content-type" and payload.get_boundary() is not None:
+            value = "; ".join(
+                f"{key}={param}" if param else key
+                for key, param in payload.get_params()
+                if key.lower() != "boundary"
+            )
+        _hash_record(hasher, b"h", header, value)
+
+
+def _marshal(marshaler, charset, primary):
+    """Marshal the field value, returning a (value, ascii) tuple"""
+    if IStatelessFieldMarshaler.providedBy(marshaler):
+        return marshaler.marshalValue(charset, primary=primary)
+    value = marshaler.marshal(charset, primary=primary)
+    return value, marshaler.ascii
+
+
+def _compress(value, encoding):
+    if encoding == "gzip":
+        # a fixed mtime keeps the output (and its digest) reproducible
+        return gzip.compress(value, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(value)
+    raise ValueError(f"Unsupported content encoding {encoding!r}")
+
 
+def _decompress(value, encoding, maxLength=None):
+    """Decompress a payload, feeding it to the decompressor in chunks.
 
-def constructMessageFromSchemata(context, schemata, charset="utf-8"):
+    Raise ``PayloadTooLarge`` as soon as the output exceeds ``maxLength``.
+    """
+    if encoding == "identity":
+        return value
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        decompressor = zlib.decompressobj()
+    else:
+        raise ValueError(f"Unsupported content encoding {encoding!r}")
+    view = memoryview(value)
+    chunks = []
+    size = 0
+    try:
+        for start in range(0, len(view), DECOMPRESS_CHUNK_SIZE):
+            data = view[start : start + DECOMPRESS_CHUNK_SIZE]
+            while data:
+                if maxLength is None:
+                    chunk = decompressor.decompress(data)
+                else:
+                    chunk = decompressor.decompress(data, maxLength - size + 1)
+                size += len(chunk)
+                if maxLength is not None and size > maxLength:
+                    raise PayloadTooLarge(f"Payload exceeds {maxLength} bytes")
+                chunks.append(chunk)
+                data = decompressor.unconsumed_tail
+        chunks.append(decompressor.flush())
+    except zlib.error as e:
+        raise ValueError(e)
+    if not decompressor.eof:
+        raise ValueError(f"Truncated {encoding} payload")
+    return b"".join(chunks)
+
+
+def constructMessageFromSchema(
+    context,
+    schema,
+    charset="utf-8",
+    digest=None,
+    compression=None,
+    compressionThreshold=1024,
+    store=None,
+):
+    return constructMessage(
+        context,
+        getFieldsInOrder(schema),
+        charset,
+        digest=digest,
+        compression=compression,
+        compressionThreshold=compressionThreshold,
+        store=store,
+    )
+
+
+def constructMessageFromSchemata(
+    context,
+    schemata,
+    charset="utf-8",
+    digest=None,
+    compression=None,
+    compressionThreshold=1024,
+    store=None,
+):
     fields = []
     for schema in schemata:
         fields.extend(getFieldsInOrder(schema))
-    return constructMessage(context, fields, charset)
-
-
-def _add_payload_to_message(context, msg, primary, charset):
+    return constructMessage(
+        context,
+        fields,
+        charset,
+        digest=digest,
+        compression=compression,
+        compressionThreshold=compressionThreshold,
+        store=store,
+    )
+
+
+def _add_payload_to_message(
+    context,
+    msg,
+    primary,
+    charset,
+    hasher=None,
+    compression=None,
+    compressionThreshold=1024,
+    store=None,
+):
     """If there's a single primary field, we have a non-multipart message with
     a string payload. Otherwise, we return a multipart message
 
+    If ``hasher`` is given, each payload gets a ``Content-Digest`` header
+    computed over its raw value. The part digest and the final headers of
+    the part are fed to ``hasher``.
+
+    If ``compression`` is given, payloads of at least ``compressionThreshold``
+    bytes are compressed, marked with a ``Content-Encoding`` header and
+    base64 encoded.
+
+    If ``store`` is given, binary payloads are put in it, keyed by their
+    digest, and the message only refers to them.
     """
     is_multipart = len(primary) > 1
     if is_multipart:
@@ -51,13 +277,16 @@ def _add_payload_to_message(context, msg, primary, charset):
     for name, field in primary:
         if is_multipart:
             payload = Message()
+            start = 0
         else:
             payload = msg
+            # the headers of the fields have been hashed already
+            start = len(msg)
         marshaler = queryMultiAdapter((context, field), IFieldMarshaler)
         if marshaler is None:
             continue
 
-        value = marshaler.marshal(charset, primary=True)
+        value, ascii = _marshal(marshaler, charset, True)
         if value is None:
             continue
 
@@ -66,11 +295,28 @@ def _add_payload_to_message(context, msg, primary, charset):
             payload.set_type(content_type)
 
         charset = marshaler.getCharset(charset)
-        if charset is None and not marshaler.ascii:
+        if hasher is not None:
+            part_hasher = hashlib.new(hasher.name, _as_bytes(value, charset))
+            part_digest = _format_digest(part_hasher)
+        # identical binary data is only kept once, in the store
+        stored = store is not None and charset is None and not ascii
+        encoding = None
+        if compression is not None and not stored:
+            raw = _as_bytes(value, charset)
+            if len(raw) >= compressionThreshold:
+                value = _compress(raw, compression)
+                encoding = compression
+        if stored:
+            _set_store_reference(payload, _as_bytes(value, charset), store)
+        elif encoding is not None:
+            if charset is not None:
+                payload.set_param("charset", charset)
+            payload[CONTENT_ENCODING_HEADER] = encoding
+            _encode_base64(payload, value)
+        elif charset is None and not ascii:
             # we have real binary data such as images, files, etc.
             # encode to base64!
-            payload.set_payload(value)
-            encode_base64(payload)
+            _encode_base64(payload, _as_bytes(value, charset))
         elif charset is not None:
             # using set_charset() would also add transfer encoding to
             # quoted-printable, which we don't want here.
@@ -83,53 +329,181 @@ def _add_payload_to_message(context, msg, primary, charset):
             value = safe_native_string(value)
             payload.set_payload(value)
 
+        if hasher is not None:
+            payload[CONTENT_DIGEST_HEADER] = part_digest
         marshaler.postProcessMessage(payload)
+        if hasher is not None:
+            _hash_part(hasher, name, part_digest, payload, start)
         if is_multipart:
             msg.attach(payload)
 
 
-def constructMessage(context, fields, charset="utf-8"):
+def _set_store_reference(payload, value, store):
+    """Put the binary ``value`` in ``store``, unless it is there already,
+    and make ``payload`` refer to it.
+    """
+    key = _format_digest(hashlib.new(STORE_DIGEST, value))
+    if key not in store:
+        store[key] = value
+    # The content type of the value goes in the headers of the phantom body
+    phantom = Message()
+    phantom["Content-Type"] = payload.get("Content-Type", "application/octet-stream")
+    phantom["Content-Transfer-Encoding"] = "binary"
+    payload.set_type(EXTERNAL_BODY_TYPE)
+    payload.set_param("access-type", STORE_ACCESS_TYPE)
+    payload.set_param("digest", key)
+    payload.set_payload([phantom])
+
+
+def _is_store_reference(payload):
+    return (
+        payload.get_content_type() == EXTERNAL_BODY_TYPE
+        and payload.get_param("access-type") == STORE_ACCESS_TYPE
+    )
+
+
+def _read_payload(payload, store=None):
+    """Return the transfer-decoded value and the content type of a primary
+    payload, resolving references to ``store``.
+    """
+    if not _is_store_reference(payload):
+        return _decoded_payload(payload), payload.get_content_type()
+    key = payload.get_param("digest")
+    if store is None:
+        raise ValueError(f"A store is needed to read payload {key}")
+    try:
+        value = store[key]
+    except KeyError:
+        raise ValueError(f"Payload {key} not found in store")
+    phantom = payload.get_payload(0)
+    return value, phantom.get_content_type()
+
+
+def _marshal_header(context, name, field, charset):
+    """Marshal a non-primary field, returning a (value, ascii) tuple, or None
+    if the field should be skipped.
+    """
+    marshaler = queryMultiAdapter((context, field), IFieldMarshaler)
+    if marshaler is None:
+        logger.debug(f"No marshaler found for field {name} of {repr(context)}")
+        return None
+    try:
+        value, ascii = _marshal(marshaler, charset, False)
+    except ValueError as e:
+        logger.debug(f"Marshaling of {name} for {repr(context)} failed: {str(e)}")
+        return None
+    if value is None:
+        value = ""
+    # Enforce native strings
+    return safe_native_string(value), ascii
+
+
+def constructMessage(
+    context,
+    fields,
+    charset="utf-8",
+    digest=None,
+    compression=None,
+    compressionThreshold=1024,
+    store=None,
+):
+    return _construct_message(
+        context, fields, charset, digest, compression, compressionThreshold, store
+    )
+
+
+def _construct_message(
+    context,
+    fields,
+    charset="utf-8",
+    digest=None,
+    compression=None,
+    compressionThreshold=1024,
+    store=None,
+    marshaled=None,
+):
+    """Implementation of ``constructMessage()``.
+
+    ``marshaled`` optionally maps field names to (value, ascii) tuples which
+    have already been marshaled, see ``plone.rfc822.batch``.
+    """
     msg = Message()
     primaries = []
+    hasher = None
+    if digest is not None:
+        hasher = hashlib.new(digest)
 
     # First get all headers, storing primary fields for later
     for name, field in fields:
-        value = ""
         if IPrimaryField.providedBy(field):
             primaries.append((name, field))
             continue
-        marshaler = queryMultiAdapter((context, field), IFieldMarshaler)
-        if marshaler is None:
-            logger.debug(f"No marshaler found for field {name} of {repr(context)}")
-            continue
-        try:
-            value = marshaler.marshal(charset, primary=False)
-        except ValueError as e:
-            logger.debug(f"Marshaling of {name} for {repr(context)} failed: {str(e)}")
+        if marshaled is not None and name in marshaled:
+            marshaled_value = marshaled[name]
+        else:
+            marshaled_value = _marshal_header(context, name, field, charset)
+        if marshaled_value is None:
             continue
-        if value is None:
-            value = ""
-        # Enforce native strings
-        value = safe_native_string(value)
-        if marshaler.ascii and "\n" not in value:
+        value, ascii = marshaled_value
+        if hasher is not None:
+            _hash_record(hasher, b"H", name, value)
+        if ascii and "\n" not in value:
             msg[name] = value
         else:
             # see https://tools.ietf.org/html/rfc2822#section-3.2.2
             if "\n" in value:
                 value = value.replace("\n", r"\n")
-            msg[name] = Header(value, charset)
+            msg[name] = EncodedHeader(value, charset)
 
     # Then deal with the primary field
-    _add_payload_to_message(context, msg, primaries, charset)
-
+    _add_payload_to_message(
+        context,
+        msg,
+        primaries,
+        charset,
+        hasher,
+        compression,
+        compressionThreshold,
+        store,
+    )
+
+    if hasher is not None:
+        msg[MESSAGE_DIGEST_HEADER] = _format_digest(hasher)
     return msg
 
 
-def initializeObjectFromSchema(context, schema, message, defaultCharset="utf-8"):
-    initializeObject(context, getFieldsInOrder(schema), message, defaultCharset)
-
-
-def initializeObjectFromSchemata(context, schemata, message, defaultCharset="utf-8"):
+def initializeObjectFromSchema(
+    context,
+    schema,
+    message,
+    defaultCharset="utf-8",
+    digest=None,
+    trusted=False,
+    store=None,
+    limits=None,
+):
+    initializeObject(
+        context,
+        getFieldsInOrder(schema),
+        message,
+        defaultCharset,
+        digest=digest,
+        trusted=trusted,
+        store=store,
+        limits=limits,
+    )
+
+
+def initializeObjectFromSchemata(
+    context,
+    schemata,
+    message,
+    defaultCharset="utf-8",
+    digest=None,
+    trusted=False,
+    store=None,
+    limits=None,
+):
     """Convenience method which calls ``initializeObject()`` with all the
     fields in order, of all the given schemata (a sequence of schema
     interfaces).
@@ -138,29 +512,82 @@ def initializeObjectFromSchemata(context, schemata, message, defaultCharset="utf
     fields = []
     for schema in schemata:
         fields.extend(getFieldsInOrder(schema))
-    return initializeObject(context, fields, message, defaultCharset)
-
+    return initializeObject(
+        context,
+        fields,
+        message,
+        defaultCharset,
+        digest=digest,
+        trusted=trusted,
+        store=store,
+        limits=limits,
+    )
+
+
+def _split_fields(fields):
+    """Split ``fields`` into a mapping of lowercase header names to lists of
+    fields, and a list of (name, field) pairs for the primary fields.
+    """
+    header_fields = {}
+    primary = []
+    for name, field in fields:
+        if IPrimaryField.providedBy(field):
+            primary.append((name, field))
+            continue
+        header_fields.setdefault(name.lower(), []).append(field)
+    return header_fields, primary
 
-def initializeObject(context, fields, message, defaultCharset="utf-8"):
-    content_type = message.get_content_type()
 
+def _message_charset(message, defaultCharset):
     charset = message.get_charset()
     if charset is None:
         charset = message.get_param("charset")
     if charset is not None:
-        charset = str(charset)
+        return str(charset)
+    return defaultCharset
+
+
+def _demarshal(marshaler, context, name, value, trusted=False, **kwargs):
+    demarshal = marshaler.demarshal
+    if trusted and ITrustedFieldMarshaler.providedBy(marshaler):
+        demarshal = marshaler.demarshalTrusted
+    try:
+        demarshal(value, **kwargs)
+    except ValueError as e:
+        # interface allows demarshal() to raise ValueError to indicate
+        # marshalling failed
+        logger.debug(
+            "Demarshalling of {} for {} failed: {}".format(name, repr(context), str(e))
+        )
+
+
+def _decode_header_value(value, charset):
+    """Decode a raw header value, returning a (value, charset) tuple"""
+    header_value, header_charset = decode_header(value)[0]
+    if header_charset is None:
+        header_charset = charset
+
+    # MIME messages always use CRLF.
+    # For headers, we're probably safer with \n
+    #
+    # Also, replace escaped Newlines, for details see
+    # https://tools.ietf.org/html/rfc2822#section-3.2.2
+    if isinstance(header_value, bytes):
+        header_value = header_value.replace(b"\r\n", b"\n")
+        header_value = header_value.replace(b"\\n", b"\n")
     else:
-        charset = defaultCharset
+        header_value = header_value.replace("\r\n", "\n")
+        header_value = header_value.replace(r"\\n", "\n")
+    return header_value, header_charset
 
-    header_fields = {}
-    primary = []
-    for name, field in fields:
-        if IPrimaryField.providedBy(field):
-            primary.append((name, field))
-            continue
-        header_fields.setdefault(name.lower(), []).append(field)
 
-    # Demarshal each header
+def _demarshal_headers(context, header_fields, message, charset, trusted=False):
+    """Demarshal each header of ``message`` into the matching field.
+
+    Fields are consumed from ``header_fields`` in order, so that duplicate
+    headers are matched to duplicate field names.
+    """
+    content_type = message.get_content_type()
     for name, value in message.items():
         name = name.lower()
         fieldset = header_fields.get(name, None)
@@ -172,48 +599,37 @@ def initializeObject(context, fields, message, defaultCharset="utf-8"):
         if marshaler is None:
             logger.debug(f"No marshaler found for field {name} of {repr(context)}")
             continue
-        header_value, header_charset = decode_header(value)[0]
-        if header_charset is None:
-            header_charset = charset
-
-        # MIME messages always use CRLF.
-        # For headers, we're probably safer with \n
-        #
-        # Also, replace escaped Newlines, for details see
-        # https://tools.ietf.org/html/rfc2822#section-3.2.2
-        if isinstance(header_value, bytes):
-            header_value = header_value.replace(b"\r\n", b"\n")
-            header_value = header_value.replace(b"\\n", b"\n")
-        else:
-            header_value = header_value.replace("\r\n", "\n")
-            header_value = header_value.replace(r"\\n", "\n")
-        try:
-            marshaler.demarshal(
-                header_value,
-                message=message,
-                charset=header_charset,
-                contentType=content_type,
-                primary=False,
-            )
-        except ValueError as e:
-            # interface allows demarshal() to raise ValueError to indicate
-            # marshalling failed
-            logger.debug(
-                "Demarshalling of {} for {} failed: {}".format(
-                    name, repr(context), str(e)
-                )
-            )
-            continue
+        header_value, header_charset = _decode_header_value(value, charset)
+        _demarshal(
+            marshaler,
+            context,
+            name,
+            header_value,
+            trusted=trusted,
+            message=message,
+            charset=header_charset,
+            contentType=content_type,
+            primary=False,
+        )
 
-    # Then demarshal the primary field(s)
-    payloads = message.get_payload()
+
+def _primary_payloads(context, message, primary):
+    """Return the list of payloads of ``message``, one for each of the
+    ``primary`` fields.
+    """
+    if message.is_multipart():
+        payloads = message.get_payload()
+    else:
+        # get_payload() would copy a string payload to check it for
+        # surrogates, when we only need to know if there is one
+        payloads = message._payload
 
     # do nothing if we don't have a payload
     if not payloads:
-        return
+        return []
 
     # A single payload is a string, multiparts are lists
-    if isinstance(payloads, str):
+    if isinstance(payloads, str) or _is_store_reference(message):
         if len(primary) != 1:
             raise ValueError(
                 "Got a single string payload for message, but no primary "
@@ -226,35 +642,103 @@ def initializeObject(context, fields, message, defaultCharset="utf-8"):
             "Got %d payloads for message, but %s primary fields "
             "found for %s" % (len(payloads), len(primary), repr(context))
         )
+    return payloads
+
+
+def _payload_charset(message):
+    charset = message.get_charset()
+    if charset is not None:
+        return str(charset)
+    return "utf-8"
+
+
+def _decode_payload_value(payload, payload_value, limits=None):
+    """Undo any content encoding of the (transfer-decoded) payload value,
+    checking its size against ``limits``.
+    """
+    maxLength = None
+    if limits is not None:
+        limits.checkPayload(len(payload_value))
+        maxLength = limits.maxPayloadBytes
+    content_encoding = payload.get(CONTENT_ENCODING_HEADER)
+    if content_encoding is not None:
+        payload_value = _decompress(
+            payload_value, str(content_encoding).strip().lower(), maxLength
+        )
+    return payload_value
+
+
+def _demarshal_payload(
+    context,
+    name,
+    field,
+    payload,
+    payload_value,
+    charset,
+    trusted=False,
+    content_type=None,
+    limits=None,
+):
+    """Demarshal the (transfer-decoded) value of a primary payload"""
+    if content_type is None:
+        content_type = payload.get_content_type()
+    marshaler = queryMultiAdapter((context, field), IFieldMarshaler)
+    if marshaler is None:
+        logger.debug(f"No marshaler found for primary field {name} of {context!r}")
+        return
+    payload_value = _decode_payload_value(payload, payload_value, limits)
+    _demarshal(
+        marshaler,
+        context,
+        name,
+        payload_value,
+        trusted=trusted,
+        message=payload,
+        charset=payload.get_content_charset(charset),
+        contentType=content_type,
+        primary=True,
+    )
+
+
+def initializeObject(
+    context,
+    fields,
+    message,
+    defaultCharset="utf-8",
+    digest=None,
+    trusted=False,
+    store=None,
+    limits=None,
+):
+    if limits is not None:
+        # Check the whole message before demarshalling anything
+        limits.checkMessage(message)
+
+    if digest is not None and _digest_matches(message, digest):
+        # The object was initialised from an identical message before
+        logger.debug(f"Message digest unchanged for {repr(context)}, skipping")
+        return
+
+    charset = _message_charset(message, defaultCharset)
+    header_fields, primary = _split_fields(fields)
+
+    # Demarshal each header
+    _demarshal_headers(context, header_fields, message, charset, trusted)
+
+    # Then demarshal the primary field(s)
+    payloads = _primary_payloads(context, message, primary)
+    charset = _payload_charset(message)
     for idx, payload in enumerate(payloads):
         name, field = primary[idx]
-        payload_content_type = payload.get_content_type()
-        charset = message.get_charset()
-        if charset is not None:
-            charset = str(charset)
-        else:
-            charset = "utf-8"
-
-        marshaler = queryMultiAdapter((context, field), IFieldMarshaler)
-        if marshaler is None:
-            logger.debug(f"No marshaler found for primary field {name} of {context!r}")
-            continue
-        payload_value = payload.get_payload(decode=True)
-        payload_charset = payload.get_content_charset(charset)
-        try:
-            marshaler.demarshal(
-                payload_value,
-                message=payload,
-                charset=payload_charset,
-                contentType=payload_content_type,
-                primary=True,
-            )
-        except ValueError as e:
-            # interface allows demarshal() to raise ValueError to
-            # indicate marshalling failed
-            logger.debug(
-                "Demarshalling of {} for {} failed: {}".format(
-                    name, repr(context), str(e)
-                )
-            )
-            continue
+        payload_value, content_type = _read_payload(payload, store)
+        _demarshal_payload(
+            context,
+            name,
+            field,
+            payload,
+            payload_value,
+            charset,
+            trusted,
+            content_type,
+            limits,
+        )
@@ -0,0 +1,187 @@
+"""Construct messages for many objects at once.
+
+``constructMessages()`` returns the same messages as calling
+``constructMessage()`` for each object, but formats the values of numeric,
+date and time fields column by column, for all objects which provide the
+same interfaces, rather than through one marshaler per value. Integer
+columns are formatted with NumPy if it is installed.
+"""
+
+from operator import attrgetter
+from operator import methodcaller
+from plone.rfc822._utils import _construct_message
+from plone.rfc822.defaultfields import ASCIISafeFieldMarshaler
+from plone.rfc822.defaultfields import DateMarshaler
+from plone.rfc822.defaultfields import DatetimeMarshaler
+from plone.rfc822.defaultfields import TimedeltaMarshaler
+from plone.rfc822.interfaces import IFieldMarshaler
+from plone.rfc822.interfaces import IPrimaryField
+from zope.component import queryMultiAdapter
+from zope.interface import providedBy
+from zope.schema import getFieldsInOrder
+
+try:
+    import numpy
+
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+_isoformat = methodcaller("isoformat")
+_days = attrgetter("days")
+_seconds = attrgetter("seconds")
+_microseconds = attrgetter("microseconds")
+
+
+def _formatIntegers(values):
+    if HAVE_NUMPY:
+        try:
+            return numpy.array(values, dtype=numpy.int64).astype(str).tolist()
+        except OverflowError:
+            pass
+    return list(map(str, values))
+
+
+def _formatText(values):
+    types = set(map(type, values))
+    if types == {int}:
+        formatted = _formatIntegers(values)
+    elif bytes in types:
+        return None
+    else:
+        formatted = list(map(str, values))
+    if not "".join(formatted).isascii():
+        # leave the charset handling to the marshaler
+        return None
+    return formatted
+
+
+def _formatIsoformat(values):
+    return list(map(_isoformat, values))
+
+
+def _formatTimedelta(values):
+    return list(
+        map(
+            "%d:%d:%d".__mod__,
+            zip(map(_days, values), map(_seconds, values), map(_microseconds, values)),
+        )
+    )
+
+
+# Marshalers whose encode() can be replaced by formatting a whole column.
+# Subclasses may encode differently, so this is looked up by exact type.
+COLUMN_FORMATTERS = {
+    ASCIISafeFieldMarshaler: _formatText,
+    DatetimeMarshaler: _formatIsoformat,
+    DateMarshaler: _formatIsoformat,
+    TimedeltaMarshaler: _formatTimedelta,
+}
+
+
+def _formatColumn(formatter, values):
+    """Format the values of one field for a group of objects, returning a
+    list of strings, or None if the column cannot be formatted as a whole.
+    """
+    present = [value for value in values if value is not None]
+    try:
+        formatted = formatter(present) if present else []
+    except Exception:
+        return None
+    if formatted is None:
+        return None
+    formatted = iter(formatted)
+    return ["" if value is None else next(formatted) for value in values]
+
+
+def _marshalColumns(contexts, fields):
+    """Return a list with, for each of ``contexts``, a dict of the marshaled
+    values of the fields which could be formatted column-wise.
+    """
+    marshaled = [{} for context in contexts]
+    first = contexts[0]
+    for name, field in fields:
+        if IPrimaryField.providedBy(field):
+            continue
+        marshaler = queryMultiAdapter((first, field), IFieldMarshaler)
+        formatter = COLUMN_FORMATTERS.get(type(marshaler))
+        if formatter is None:
+            continue
+        if field.interface is None:
+            instances = contexts
+        else:
+            instances = [field.interface(context, context) for context in contexts]
+        values = [getattr(instance, field.__name__, None) for instance in instances]
+        column = _formatColumn(formatter, values)
+        if column is None:
+            continue
+        for values, value in zip(marshaled, column):
+            values[name] = (value, True)
+    return marshaled
+
+
+def constructMessages(
+    contexts,
+    fields,
+    charset="utf-8",
+    digest=None,
+    compression=None,
+    compressionThreshold=1024,
+    store=None,
+):
+    """Construct a message for each of ``contexts``, from the given fields.
+
+    This returns a list of the messages which ``constructMessage()`` would
+    return for each context, see ``IMessageAPI``.
+    """
+    contexts = list(contexts)
+    fields = list(fields)
+
+    # The marshalers, and so the way values are formatted, depend on what
+    # the contexts provide
+    groups = {}
+    for index, context in enumerate(contexts):
+        groups.setdefault(providedBy(context), []).append(index)
+
+    marshaled = [None] * len(contexts)
+    for indexes in groups.values():
+        columns = _marshalColumns([contexts[index] for index in indexes], fields)
+        for index, values in zip(indexes, columns):
+            marshaled[index] = values
+
+    return [
+        _construct_message(
+            context,
+            fields,
+            charset,
+            digest,
+            compression,
+            compressionThreshold,
+            store,
+            marshaled=values,
+        )
+        for context, values in zip(contexts, marshaled)
+    ]
+
+
+def constructMessagesFromSchema(
+    contexts,
+    schema,
+    charset="utf-8",
+    digest=None,
+    compression=None,
+    compressionThreshold=1024,
+    store=None,
+):
+    """Convenience method which calls ``constructMessages()`` with all the
+    fields in order, of the given schema interface.
+    """
+    return constructMessages(
+        contexts,
+        getFieldsInOrder(schema),
+        charset,
+        digest=digest,
+        compression=compression,
+        compressionThreshold=compressionThreshold,
+        store=store,
+    )
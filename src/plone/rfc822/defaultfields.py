@@ -31,41 +31,160 @@ Unsupported by default:
 * Dict - stores a dict
 """
 
+from collections import Counter
+from plone.rfc822.interfaces import IDefaultFieldMarshaler
 from plone.rfc822.interfaces import IFieldMarshaler
+from plone.rfc822.interfaces import IStatelessFieldMarshaler
+from plone.rfc822.interfaces import ITrustedFieldMarshaler
 from zope.component import adapter
+from zope.component import getGlobalSiteManager
 from zope.component import queryMultiAdapter
 from zope.interface import implementer
 from zope.interface import Interface
+from zope.schema import Bool
+from zope.schema import Choice
+from zope.schema import Int
+from zope.schema import Number
+from zope.schema import Password
+from zope.schema import Text
+from zope.schema import TextLine
+from zope.schema.interfaces import IASCII
+from zope.schema.interfaces import IASCIILine
+from zope.schema.interfaces import IBool
 from zope.schema.interfaces import IBytes
+from zope.schema.interfaces import IChoice
 from zope.schema.interfaces import ICollection
 from zope.schema.interfaces import IDate
 from zope.schema.interfaces import IDatetime
+from zope.schema.interfaces import IDecimal
+from zope.schema.interfaces import IFloat
 from zope.schema.interfaces import IFromUnicode
+from zope.schema.interfaces import IInt
+from zope.schema.interfaces import INativeString
 from zope.schema.interfaces import ITimedelta
 
 import datetime
 import dateutil.parser
+import decimal
+import math
+import unicodedata
 
 _marker = object()
 
+# Number of values per field type which were demarshalled without
+# validation, see ``UnicodeFieldMarshaler.decodeTrusted()``
+skippedValidations = Counter()
 
-@implementer(IFieldMarshaler)
+
+def _textFromUnicode(field, value):
+    if field.unicode_normalization:
+        value = unicodedata.normalize(field.unicode_normalization, value)
+    return value
+
+
+def _boolFromUnicode(field, value):
+    return value == "True" or value == "true"
+
+
+def _numberFromUnicode(field, value):
+    last_exc = None
+    for converter in field._unicode_converters:
+        try:
+            val = converter(value)
+            if (
+                converter is float
+                and math.isinf(val)
+                and decimal.Decimal in field._unicode_converters
+            ):
+                val = decimal.Decimal(value)
+        except (ValueError, decimal.InvalidOperation) as e:
+            last_exc = e
+        else:
+            return val
+    raise ValueError(last_exc)
+
+
+def _choiceFromUnicode(field, value):
+    return value
+
+
+# Conversions equivalent to the ``fromUnicode()`` implementations in
+# zope.schema, minus the call to ``validate()``. Fields which override
+# ``fromUnicode()`` are not listed and will always be validated.
+_trustedConverters = {
+    Text.fromUnicode: _textFromUnicode,
+    Bool.fromUnicode: _boolFromUnicode,
+    Number.fromUnicode: _numberFromUnicode,
+    Choice.fromUnicode: _choiceFromUnicode,
+}
+
+
+@implementer(IDefaultFieldMarshaler)
 class BaseFieldMarshaler:
-    """Base class for field marshalers"""
+    """Base class for field marshalers.
+
+    The field is only bound to the context, and the context only adapted to
+    the field's interface, when this is first needed.
+    """
 
-    ascii = False
+    __slots__ = ("context", "_field", "_boundField", "_instance", "_ascii")
 
     def __init__(self, context, field):
         self.context = context
-        self.field = field.bind(context)
-        self.instance = context
-        if field.interface is not None:
-            self.instance = field.interface(context, context)
+        self._field = field
+
+    @property
+    def field(self):
+        try:
+            return self._boundField
+        except AttributeError:
+            self._boundField = self._field.bind(self.context)
+            return self._boundField
+
+    @field.setter
+    def field(self, value):
+        self._field = self._boundField = value
+
+    @property
+    def instance(self):
+        try:
+            return self._instance
+        except AttributeError:
+            instance = self.context
+            if self._field.interface is not None:
+                instance = self._field.interface(instance, instance)
+            self._instance = instance
+            return instance
+
+    @instance.setter
+    def instance(self, value):
+        self._instance = value
+
+    # The value of ``ascii`` until it is set. Subclasses with slots override
+    # this rather than ``ascii``, which would make ``ascii`` read-only.
+    _defaultASCII = False
+
+    @property
+    def ascii(self):
+        return getattr(self, "_ascii", self._defaultASCII)
+
+    @ascii.setter
+    def ascii(self, value):
+        self._ascii = value
 
     def marshal(self, charset="utf-8", primary=False):
         value = self._query(_marker)
         return None if value is _marker else self.encode(value, charset, primary)
 
+    def marshalValue(self, charset="utf-8", primary=False):
+        if type(self).marshal is not BaseFieldMarshaler.marshal:
+            # marshal() has been customised, so we have to go through it
+            return self.marshal(charset, primary), self.ascii
+        value = self._query(_marker)
+        if value is _marker:
+            return None, self.ascii
+        return self.encodeValue(value, charset, primary)
+
     def demarshal(
         self,
         value,
@@ -77,12 +196,31 @@ class BaseFieldMarshaler:
         if value:
             fieldValue = self.decode(value, message, charset, contentType, primary)
         else:
-            fieldValue = self.field.missing_value
+            fieldValue = self._field.missing_value
+        self._set(fieldValue)
+
+    def demarshalTrusted(
+        self,
+        value,
+        message=None,
+        charset="utf-8",
+        contentType=None,
+        primary=False,
+    ):
+        if value:
+            fieldValue = self.decodeTrusted(
+                value, message, charset, contentType, primary
+            )
+        else:
+            fieldValue = self._field.missing_value
         self._set(fieldValue)
 
     def encode(self, value, charset="utf-8", primary=False):
         return None
 
+    def encodeValue(self, value, charset="utf-8", primary=False):
+        return self.encode(value, charset, primary), self.ascii
+
     def decode(
         self,
         value,
@@ -93,6 +231,16 @@ class BaseFieldMarshaler:
     ):
         raise ValueError("Demarshalling not implemented for %s" % repr(self.field))
 
+    def decodeTrusted(
+        self,
+        value,
+        message=None,
+        charset="utf-8",
+        contentType=None,
+        primary=False,
+    ):
+        return self.decode(value, message, charset, contentType, primary)
+
     def getContentType(self):
         return None
 
@@ -105,15 +253,11 @@ class BaseFieldMarshaler:
     # Helper methods
 
     def _query(self, default=None):
-        return self.field.query(self.instance, default)
+        return self._field.query(self.instance, default)
 
     def _set(self, value):
-        if getattr(self.instance, "marker", False):
-            print(self.field.__name__)
-            print(value)
-            print("-" * 5)
         try:
-            self.field.set(self.instance, value)
+            self._field.set(self.instance, value)
         except TypeError as e:
             raise ValueError(e)
 
@@ -122,6 +266,8 @@ class BaseFieldMarshaler:
 class UnicodeFieldMarshaler(BaseFieldMarshaler):
     """Default marshaler for fields that support IFromUnicode"""
 
+    __slots__ = ()
+
     def encode(self, value, charset="utf-8", primary=False):
         if value is None:
             return
@@ -147,6 +293,25 @@ class UnicodeFieldMarshaler(BaseFieldMarshaler):
         except Exception as e:
             raise ValueError(e)
 
+    def decodeTrusted(
+        self,
+        value,
+        message=None,
+        charset="utf-8",
+        contentType=None,
+        primary=False,
+    ):
+        converter = _trustedConverters.get(type(self.field).fromUnicode)
+        if converter is None:
+            return self.decode(value, message, charset, contentType, primary)
+        if isinstance(value, bytes):
+            value = value.decode(charset)
+        skippedValidations[type(self.field).__name__] += 1
+        try:
+            return converter(self.field, value)
+        except Exception as e:
+            raise ValueError(e)
+
     def getCharset(self, default="utf-8"):
         return default
 
@@ -156,21 +321,28 @@ class UnicodeValueFieldMarshaler(UnicodeFieldMarshaler):
     ASCII safe.
     """
 
+    __slots__ = ()
+
     def encode(self, value, charset="utf-8", primary=False):
-        encoded = super().encode(value, charset, primary)
-        if not encoded or max(iter(encoded)) < 128:
-            self.ascii = True
-        else:
-            self.ascii = False
+        encoded, self.ascii = self.encodeValue(value, charset, primary)
         return encoded
 
+    def encodeValue(self, value, charset="utf-8", primary=False):
+        if type(self).encode is not UnicodeValueFieldMarshaler.encode:
+            # encode() has been customised, so we have to go through it
+            return super().encodeValue(value, charset, primary)
+        encoded = super().encode(value, charset, primary)
+        return encoded, not encoded or max(encoded) < 128
+
 
 class ASCIISafeFieldMarshaler(UnicodeFieldMarshaler):
     """Default marshaler for fields that are ASCII safe, but still support
     IFromUnicode. This includes Int, Float, Decimal, and Bool.
     """
 
-    ascii = True
+    __slots__ = ()
+
+    _defaultASCII = True
 
     def getCharset(self, default="utf-8"):
         return None
@@ -182,7 +354,9 @@ class BytesFieldMarshaler(BaseFieldMarshaler):
     objects, so we will attempt to encode them directly.
     """
 
-    ascii = True
+    __slots__ = ()
+
+    _defaultASCII = True
 
     def encode(self, value, charset="utf-8", primary=False):
         return value
@@ -202,7 +376,9 @@ class BytesFieldMarshaler(BaseFieldMarshaler):
 class DatetimeMarshaler(BaseFieldMarshaler):
     """Marshaler for Python datetime values"""
 
-    ascii = True
+    __slots__ = ()
+
+    _defaultASCII = True
 
     def encode(self, value, charset="utf-8", primary=False):
         if value is None:
@@ -234,7 +410,9 @@ class DateMarshaler(BaseFieldMarshaler):
     information.
     """
 
-    ascii = True
+    __slots__ = ()
+
+    _defaultASCII = True
 
     def encode(self, value, charset="utf-8", primary=False):
         if value is None:
@@ -265,7 +443,9 @@ class TimedeltaMarshaler(BaseFieldMarshaler):
     information.
     """
 
-    ascii = True
+    __slots__ = ()
+
+    _defaultASCII = True
 
     def encode(self, value, charset="utf-8", primary=False):
         if value is None:
@@ -291,43 +471,61 @@ class TimedeltaMarshaler(BaseFieldMarshaler):
 class CollectionMarshaler(BaseFieldMarshaler):
     """Marshaler for collection values"""
 
-    ascii = False
+    __slots__ = ("_valueTypeMarshaler",)
+
+    @property
+    def valueTypeMarshaler(self):
+        """The marshaler for the collection's value type, or None"""
+        try:
+            return self._valueTypeMarshaler
+        except AttributeError:
+            self._valueTypeMarshaler = queryMultiAdapter(
+                (self.context, self._field.value_type), IFieldMarshaler
+            )
+            return self._valueTypeMarshaler
 
     def getCharset(self, default="utf-8"):
-        valueTypeMarshaler = queryMultiAdapter(
-            (self.context, self.field.value_type), IFieldMarshaler
-        )
+        valueTypeMarshaler = self.valueTypeMarshaler
         if valueTypeMarshaler is None:
             return None
         return valueTypeMarshaler.getCharset(default)
 
     def encode(self, value, charset="utf-8", primary=False):
+        encoded, self.ascii = self.encodeValue(value, charset, primary)
+        return encoded
+
+    def encodeValue(self, value, charset="utf-8", primary=False):
+        if type(self).encode is not CollectionMarshaler.encode:
+            # encode() has been customised, so we have to go through it
+            return super().encodeValue(value, charset, primary)
         if value is None:
-            return None
+            return None, False
 
-        valueTypeMarshaler = queryMultiAdapter(
-            (self.context, self.field.value_type), IFieldMarshaler
-        )
+        valueTypeMarshaler = self.valueTypeMarshaler
         if valueTypeMarshaler is None:
-            return None
+            return None, False
+        if IStatelessFieldMarshaler.providedBy(valueTypeMarshaler):
+            encodeItem = valueTypeMarshaler.encodeValue
+        else:
+
+            def encodeItem(item, charset, primary):
+                encoded = valueTypeMarshaler.encode(item, charset, primary)
+                return encoded, valueTypeMarshaler.ascii
 
         ascii = True
         value_lines = []
         for item in value:
-            marshaledValue = valueTypeMarshaler.encode(
-                item, charset=charset, primary=primary
-            )
+            marshaledValue, itemASCII = encodeItem(item, charset, primary)
             if marshaledValue is None:
                 marshaledValue = ""
             value_lines.append(marshaledValue)
-            if not valueTypeMarshaler.ascii:
+            if not itemASCII:
                 ascii = False
 
-        self.ascii = ascii
         if value_lines and isinstance(value_lines[0], bytes):
-            return b"||".join(value_lines)
+            return b"||".join(value_lines), ascii
         else:
-            return "||".join(value_lines)
+            return "||".join(value_lines), ascii
 
     def decode(
         self,
@@ -337,13 +535,27 @@ class CollectionMarshaler(BaseFieldMarshaler):
         contentType=None,
         primary=False,
     ):
-        valueTypeMarshaler = queryMultiAdapter(
-            (self.context, self.field.value_type), IFieldMarshaler
-        )
+        return self._decode(value, message, charset, contentType, primary, False)
+
+    def decodeTrusted(
+        self,
+        value,
+        message=None,
+        charset="utf-8",
+        contentType=None,
+        primary=False,
+    ):
+        return self._decode(value, message, charset, contentType, primary, True)
+
+    def _decode(self, value, message, charset, contentType, primary, trusted):
+        valueTypeMarshaler = self.valueTypeMarshaler
         if valueTypeMarshaler is None:
             raise ValueError(
                 "Cannot demarshal value type %s" % repr(self.field.value_type)
             )
+        decode = valueTypeMarshaler.decode
+        if trusted and ITrustedFieldMarshaler.providedBy(valueTypeMarshaler):
+            decode = valueTypeMarshaler.decodeTrusted
 
         listValue = []
         if isinstance(value, bytes):
@@ -351,12 +563,56 @@ class CollectionMarshaler(BaseFieldMarshaler):
         else:
             lines = value.split("||")
         for line in lines:
-            listValue.append(
-                valueTypeMarshaler.decode(line, message, charset, contentType, primary)
-            )
+            listValue.append(decode(line, message, charset, contentType, primary))
 
         sequenceType = self.field._type
         if isinstance(sequenceType, (list, tuple)):
             sequenceType = sequenceType[-1]
 
         return sequenceType(listValue)
+
+
+# The default marshalers, as (factory, required) pairs. ``required`` is None
+# for the interfaces the factory declares with ``@adapter``. Like ``*`` in
+# ZCML, None in ``required`` stands for any context.
+DEFAULT_MARSHALERS = [
+    # Standard IFromUnicode marshaler
+    (UnicodeFieldMarshaler, None),
+    # Text, TextLine, Password, SourceText may be ASCII safe
+    (UnicodeValueFieldMarshaler, (None, INativeString)),
+    (ASCIISafeFieldMarshaler, (None, IASCII)),
+    (ASCIISafeFieldMarshaler, (None, IASCIILine)),
+    # Bool and Choice omit to declare that they support IFromUnicode in
+    # zope.schema 3.3. The Bool class is needed as a workaround for
+    # https://github.com/zopefoundation/zope.schema/issues/80
+    (ASCIISafeFieldMarshaler, (None, IBool)),
+    (ASCIISafeFieldMarshaler, (None, Bool)),
+    (UnicodeValueFieldMarshaler, (None, IChoice)),
+    # Int, Float, and Decimal are ASCII safe
+    (ASCIISafeFieldMarshaler, (None, IInt)),
+    (ASCIISafeFieldMarshaler, (None, IFloat)),
+    (ASCIISafeFieldMarshaler, (None, IDecimal)),
+    # Somehow this is necessary because these are in _bootstrapfields
+    (UnicodeValueFieldMarshaler, (None, Text)),
+    (UnicodeValueFieldMarshaler, (None, TextLine)),
+    (UnicodeValueFieldMarshaler, (None, Password)),
+    (ASCIISafeFieldMarshaler, (None, Int)),
+    (BytesFieldMarshaler, None),
+    (DatetimeMarshaler, None),
+    (DateMarshaler, None),
+    (TimedeltaMarshaler, None),
+    (CollectionMarshaler, None),
+]
+
+
+def registerDefaultMarshalers(registry=None):
+    """Register the adapters in ``DEFAULT_MARSHALERS`` with ``registry``, or
+    with the global site manager.
+
+    This makes the same registrations as the ``configure.zcml`` file of this
+    package, without the cost of loading it.
+    """
+    if registry is None:
+        registry = getGlobalSiteManager()
+    for factory, required in DEFAULT_MARSHALERS:
+        registry.registerAdapter(factory, required)
@@ -0,0 +1,248 @@
+"""Resumable export of many objects to mbox files.
+
+``exportShard()`` renders the messages for one shard of a sequence of
+objects to its own mbox file. Progress is recorded in a checkpoint file
+next to it, so that an interrupted export resumes after the last message
+which was committed. ``exportMessages()`` exports all the shards, in a pool
+of worker processes.
+
+The mbox files use the ``mboxrd`` convention: lines starting with
+``From ``, after any number of ``>``, are quoted with another ``>``. Use
+``mboxMessages(path, mboxrd=True)`` to read them back.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from email.generator import BytesGenerator
+from io import BytesIO
+from plone.rfc822._utils import constructMessageFromSchemata
+
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger("plone.rfc822")
+
+# The From line which starts each message. It is the same for all messages,
+# so that a resumed export writes the same file as an uninterrupted one.
+MBOX_FROM_LINE = b"From MAILER-DAEMON Thu Jan  1 00:00:00 1970\n"
+
+_fromLine = re.compile(rb"^(>*From )", re.MULTILINE)
+
+# The contexts of a worker process, see _initWorker()
+_workerContexts = None
+
+
+def shardPath(directory, shard):
+    """The path of the mbox file of a completed shard"""
+    return os.path.join(directory, f"shard-{shard:04d}.mbox")
+
+
+def checkpointPath(directory, shard):
+    """The path of the checkpoint file of a shard"""
+    return os.path.join(directory, f"shard-{shard:04d}.json")
+
+
+def readCheckpoint(directory, shard):
+    """Return the checkpoint of a shard as a dict, or None if the shard has
+    not been started.
+
+    The checkpoint has the ``shard`` number, the number of ``shards``, the
+    ``start`` and ``end`` indexes of the objects in the shard, the
+    ``count`` of messages committed and the ``offset`` in bytes after the
+    last of them, and whether the shard is ``complete``.
+    """
+    try:
+        with open(checkpointPath(directory, shard)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _writeCheckpoint(directory, checkpoint):
+    path = checkpointPath(directory, checkpoint["shard"])
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _renderMessage(message):
+    # Text payloads are kept as str, which as_bytes() cannot write if they
+    # are not ASCII. Store them as they would be after parsing the message,
+    # encoded in their charset, so that they are written out as 8-bit data.
+    for part in message.walk():
+        payload = part.get_payload()
+        if isinstance(payload, str) and not payload.isascii():
+            charset = part.get_content_charset() or "utf-8"
+            payload = payload.encode(charset, "surrogateescape")
+            part.set_payload(payload.decode("ascii", "surrogateescape"))
+    buffer = BytesIO()
+    BytesGenerator(buffer, mangle_from_=False).flatten(message)
+    data = _fromLine.sub(rb">\1", buffer.getvalue())
+    if not data.endswith(b"\n"):
+        data += b"\n"
+    return MBOX_FROM_LINE + data + b"\n"
+
+
+def shardBounds(length, shard, shards):
+    """Return the ``(start, end)`` indexes of a shard of a sequence of
+    ``length`` items, split into ``shards`` contiguous shards.
+    """
+    return length * shard // shards, length * (shard + 1) // shards
+
+
+def exportShard(
+    contexts,
+    schemata,
+    directory,
+    shard=0,
+    shards=1,
+    checkpointInterval=100,
+    **options,
+):
+    """Export one shard of ``contexts`` to an mbox file in ``directory``.
+
+    ``contexts`` is a sequence of objects, which must be the same, in the
+    same order, each time an export is run. The indexes of the objects in
+    the shard are recorded in the checkpoint, and if they have changed, a
+    ``ValueError`` is raised. It is split into ``shards``
+    contiguous shards, and the messages for the objects of shard number
+    ``shard`` are constructed with ``constructMessageFromSchemata()``, which
+    is given ``schemata`` and any further keyword ``options``.
+
+    The messages are appended to a ``.part`` file. Every
+    ``checkpointInterval`` messages, the file is synced to disk and a
+    checkpoint is written. If the export is interrupted, it resumes from
+    the last checkpoint: the file is truncated to the size recorded there,
+    and the messages which were committed are skipped. When all messages
+    have been written, the file is renamed to ``shardPath()``. A shard
+    whose file exists is not exported again.
+
+    Returns the number of messages written, which excludes those committed
+    by an earlier export.
+    """
+    path = shardPath(directory, shard)
+    partPath = path + ".part"
+    start, end = shardBounds(len(contexts), shard, shards)
+
+    checkpoint = readCheckpoint(directory, shard)
+    if checkpoint is not None and checkpoint["shards"] != shards:
+        raise ValueError(
+            f"Shard {shard} in {directory} was started with "
+            f"{checkpoint['shards']} shards, not {shards}"
+        )
+    if checkpoint is not None and (checkpoint["start"], checkpoint["end"]) != (
+        start,
+        end,
+    ):
+        raise ValueError(
+            f"Shard {shard} in {directory} was started with objects "
+            f"{checkpoint['start']} to {checkpoint['end']}, not {start} to {end}"
+        )
+    if os.path.exists(path):
+        return 0
+    if checkpoint is None or not os.path.exists(partPath):
+        checkpoint = {
+            "shard": shard,
+            "shards": shards,
+            "start": start,
+            "end": end,
+            "count": 0,
+            "offset": 0,
+            "complete": False,
+        }
+    elif checkpoint["count"]:
+        logger.info(
+            f"Resuming shard {shard} after {checkpoint['count']} of "
+            f"{end - start} messages"
+        )
+
+    with open(partPath, "ab") as f:
+        # Discard anything written after the last checkpoint
+        f.truncate(checkpoint["offset"])
+        f.seek(checkpoint["offset"])
+        resumed = count = checkpoint["count"]
+        for context in contexts[start + count : end]:
+            message = constructMessageFromSchemata(context, schemata, **options)
+            f.write(_renderMessage(message))
+            count += 1
+            if count % checkpointInterval == 0:
+                f.flush()
+                os.fsync(f.fileno())
+                checkpoint.update(count=count, offset=f.tell())
+                _writeCheckpoint(directory, checkpoint)
+        f.flush()
+        os.fsync(f.fileno())
+        checkpoint.update(count=count, offset=f.tell())
+
+    _writeCheckpoint(directory, checkpoint)
+    os.replace(partPath, path)
+    checkpoint["complete"] = True
+    _writeCheckpoint(directory, checkpoint)
+    logger.info(f"Exported shard {shard} with {count} messages to {path}")
+    return count - resumed
+
+
+def _initWorker(load):
+    global _workerContexts
+    _workerContexts = load()
+
+
+def _exportWorkerShard(schemata, directory, shard, shards, options):
+    return exportShard(_workerContexts, schemata, directory, shard, shards, **options)
+
+
+def exportMessages(
+    load,
+    schemata,
+    directory,
+    shards=None,
+    processes=None,
+    checkpointInterval=100,
+    **options,
+):
+    """Export the objects returned by ``load()`` to ``shards`` mbox files in
+    ``directory``, see ``exportShard()``.
+
+    The shards are exported in a pool of ``processes`` worker processes, by
+    default one per shard up to the number of CPUs. ``load`` is called once
+    in each worker, and must return the same sequence of objects each time.
+    It must be picklable, i.e. a module level function, as must
+    ``schemata`` and ``options``. As the workers may not share the
+    component registry of the calling process, ``load`` should set up the
+    field marshalers too, for instance with ``registerDefaultMarshalers()``.
+    Pass ``processes=0`` to export all shards in the calling process.
+
+    Completed shards are skipped and interrupted ones are resumed, so an
+    export can be restarted by calling this again with the same arguments.
+
+    Returns the number of messages exported by this call, which excludes
+    those of shards exported before.
+    """
+    if shards is None:
+        shards = os.cpu_count() or 1
+    if processes is None:
+        processes = min(shards, os.cpu_count() or 1)
+    options["checkpointInterval"] = checkpointInterval
+    os.makedirs(directory, exist_ok=True)
+
+    if processes == 0:
+        contexts = load()
+        return sum(
+            exportShard(contexts, schemata, directory, shard, shards, **options)
+            for shard in range(shards)
+        )
+
+    with ProcessPoolExecutor(
+        processes, initializer=_initWorker, initargs=(load,)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _exportWorkerShard, schemata, directory, shard, shards, options
+            )
+            for shard in range(shards)
+        ]
+        return sum(future.result() for future in futures)
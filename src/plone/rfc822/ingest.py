@@ -0,0 +1,243 @@
+"""Bulk ingestion of messages from mbox files and Maildir directories.
+
+``mboxMessages()`` and ``maildirMessages()`` produce ``(key, data)`` pairs.
+``ingestMessages()`` parses them in a pool of processes and hands each parsed
+message to a callback, which returns the context to initialise with
+``initializeObject()``.
+"""
+
+from collections import deque
+from concurrent.futures import BrokenExecutor
+from concurrent.futures import ProcessPoolExecutor
+from email import message_from_bytes
+from plone.rfc822._utils import initializeObject
+from plone.rfc822.limits import parseMessage
+
+import logging
+import mmap
+import os
+import re
+
+logger = logging.getLogger("plone.rfc822")
+
+MBOX_SEPARATOR = b"From "
+
+_quotedFromLine = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+
+def _mboxEnd(data, end):
+    """Strip the blank line which separates a message from the next one"""
+    if data[end - 2 : end] == b"\r\n":
+        end -= 2
+    elif data[end - 1 : end] == b"\n":
+        end -= 1
+    return end
+
+
+def mboxMessages(path, mboxrd=False):
+    """Iterate over the messages in the mbox file at ``path``.
+
+    Yields ``(index, data)`` pairs, where ``data`` is the message without its
+    ``From`` line. The file is memory mapped, so only the message being
+    yielded is copied into memory. If ``mboxrd`` is true, one ``>`` is
+    removed from lines which start with ``>From ``, ``>>From `` and so on.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[: len(MBOX_SEPARATOR)] != MBOX_SEPARATOR:
+                raise ValueError(f"{path} is not an mbox file")
+            separator = b"\n" + MBOX_SEPARATOR
+            index = 0
+            start = 0
+            while start >= 0:
+                # skip the From line
+                bodyStart = data.find(b"\n", start) + 1 or len(data)
+                nextStart = data.find(separator, bodyStart)
+                if nextStart < 0:
+                    end = len(data)
+                else:
+                    end = nextStart + 1
+                    nextStart += 1
+                message = data[bodyStart : _mboxEnd(data, end)]
+                if mboxrd:
+                    message = _quotedFromLine.sub(rb"\1", message)
+                yield index, message
+                index += 1
+                start = nextStart
+
+
+def maildirMessages(path):
+    """Iterate over the messages in the Maildir at ``path``.
+
+    Yields ``(key, data)`` pairs for the messages in ``new`` and ``cur``,
+    where ``key`` is the unique name of the message, without its flags.
+    """
+    for subdir in ("new", "cur"):
+        directory = os.path.join(path, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.startswith("."):
+                continue
+            with open(os.path.join(directory, name), "rb") as f:
+                data = f.read()
+            yield name.split(":", 1)[0], data
+
+
+def _parse(data, limits=None):
+    if limits is None:
+        return message_from_bytes(data)
+    return parseMessage(data, limits)
+
+
+def _parseBatch(batch, limits=None):
+    """Parse a list of message data, returning a ``(message, exception)``
+    pair for each of them.
+    """
+    results = []
+    for data in batch:
+        try:
+            results.append((_parse(data, limits), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def ingestMessages(
+    messages,
+    fields,
+    callback,
+    workers=4,
+    maxPending=None,
+    progress=None,
+    progressInterval=100,
+    executor=None,
+    batchSize=64,
+    **options,
+):
+    """Parse ``messages`` and initialise an object from each of them.
+
+    ``messages`` is an iterable of ``(key, data)`` pairs, such as those
+    returned by ``mboxMessages()`` and ``maildirMessages()``. The data is
+    parsed in ``executor`` or, if that is not given, in a process pool of
+    ``workers`` processes. Parsing is pure Python, so a thread pool would
+    not parse any faster than the calling thread. Pass ``workers=0`` to
+    parse in the calling thread. The messages are sent to the executor in
+    batches of ``batchSize``, which keeps the cost of passing them between
+    processes down. At most ``maxPending`` messages (by default four
+    batches per worker) are read ahead of the message being processed.
+
+    For each message, in order, ``callback(key, message)`` is called in the
+    calling thread. It returns the context to initialise, or None to skip
+    the message. The context is initialised with ``initializeObject()``,
+    which is given ``fields`` and any further keyword ``options``. If these
+    include ``limits``, messages are also parsed with ``parseMessage()``.
+
+    If a message cannot be parsed or initialised, the error is logged and
+    collected, and ingestion continues with the next message. A context
+    whose initialisation failed may have been initialised in part; it is
+    up to the caller to discard it. If the executor fails to parse a batch,
+    for instance because a worker process died, the batch is parsed again
+    in the calling thread. A broken process pool of our own is replaced;
+    if the given ``executor`` breaks, the remaining messages are parsed in
+    the calling thread.
+    ``progress(processed, errors)`` is called every ``progressInterval``
+    messages and at the end, if given.
+
+    Returns a tuple of the number of messages processed and a list of
+    ``(key, exception)`` pairs for the messages which failed.
+    """
+    limits = options.get("limits")
+    if maxPending is None:
+        maxPending = max(workers, 1) * 4 * batchSize
+    processed = 0
+    seen = 0
+    errors = []
+
+    def handle(key, message, error):
+        nonlocal processed, seen
+        seen += 1
+        try:
+            if error is not None:
+                raise error
+            context = callback(key, message)
+            if context is not None:
+                initializeObject(context, fields, message, **options)
+                processed += 1
+        except Exception as e:
+            logger.warning(f"Could not ingest message {key!r}: {e}")
+            errors.append((key, e))
+        if progress is not None and seen % progressInterval == 0:
+            progress(processed, len(errors))
+
+    def submit(batch):
+        nonlocal executor, ownExecutor
+        try:
+            return executor.submit(_parseBatch, batch, limits)
+        except BrokenExecutor as e:
+            if ownExecutor is None:
+                logger.warning(f"Parsing in the calling thread: {e}")
+                executor = None
+                return None
+            logger.warning(f"Replacing broken process pool: {e}")
+            ownExecutor.shutdown(cancel_futures=True)
+            executor = ownExecutor = ProcessPoolExecutor(workers)
+            return executor.submit(_parseBatch, batch, limits)
+
+    def handleBatch(keys, batch, parsed):
+        results = None
+        if parsed is not None:
+            try:
+                results = parsed.result()
+            except Exception as e:
+                logger.warning(f"Parsing {len(batch)} messages again: {e}")
+        if results is None:
+            results = _parseBatch(batch, limits)
+        for key, (message, error) in zip(keys, results):
+            handle(key, message, error)
+
+    ownExecutor = None
+    if executor is None and workers > 0:
+        executor = ownExecutor = ProcessPoolExecutor(workers)
+    try:
+        if executor is None:
+            for key, data in messages:
+                handle(key, *_parseBatch([data], limits)[0])
+        else:
+            pending = deque()
+            pendingCount = 0
+            batches = _batches(messages, batchSize)
+            for keys, batch in batches:
+                parsed = submit(batch) if executor is not None else None
+                pending.append((keys, batch, parsed))
+                pendingCount += len(keys)
+                while pendingCount > maxPending:
+                    keys, batch, parsed = pending.popleft()
+                    pendingCount -= len(keys)
+                    handleBatch(keys, batch, parsed)
+            while pending:
+                handleBatch(*pending.popleft())
+    finally:
+        if ownExecutor is not None:
+            ownExecutor.shutdown(cancel_futures=True)
+
+    if progress is not None and seen % progressInterval:
+        progress(processed, len(errors))
+    return processed, errors
+
+
+def _batches(messages, batchSize):
+    """Group ``(key, data)`` pairs into ``(keys, batch)`` pairs of lists"""
+    keys = []
+    batch = []
+    for key, data in messages:
+        keys.append(key)
+        batch.append(data)
+        if len(batch) >= batchSize:
+            yield keys, batch
+            keys = []
+            batch = []
+    if batch:
+        yield keys, batch
@@ -26,18 +26,42 @@ class IMessageAPI(Interface):
     from plone.rfc822 import constructMessage
     """
 
-    def constructMessageFromSchema(context, schema, charset="utf-8"):
+    def constructMessageFromSchema(
+        context,
+        schema,
+        charset="utf-8",
+        digest=None,
+        compression=None,
+        compressionThreshold=1024,
+        store=None,
+    ):
         """Convenience method which calls ``constructMessage()`` with all the
         fields, in order, of the given schema interface
         """
 
-    def constructMessageFromSchemata(context, schemata, charset="utf-8"):
+    def constructMessageFromSchemata(
+        context,
+        schemata,
+        charset="utf-8",
+        digest=None,
+        compression=None,
+        compressionThreshold=1024,
+        store=None,
+    ):
         """Convenience method which calls ``constructMessage()`` with all the
         fields, in order, of all the given schemata (a sequence of schema
         interfaces).
         """
 
-    def constructMessage(context, fields, charset="utf-8"):
+    def constructMessage(
+        context,
+        fields,
+        charset="utf-8",
+        digest=None,
+        compression=None,
+        compressionThreshold=1024,
+        store=None,
+    ):
         """Helper method to construct a message.
 
         ``context`` is a content object.
@@ -56,6 +80,28 @@ class IMessageAPI(Interface):
 
         A field will be ignored if ``(context, field)`` cannot be multi-adapted
         to ``IFieldMarshaler``, or if the ``marshal()`` method returns None.
+
+        ``digest`` is an optional ``hashlib`` algorithm name, e.g. "sha256".
+        If given, each primary payload gets a ``Content-Digest`` header
+        computed over its value, and the message gets a ``Message-Digest``
+        header covering the field headers and, for each payload, its
+        ``Content-Digest`` and its other headers, such as the content type
+        and any filename. The multipart boundary is left out, so the digest
+        is stable across exports. Both are computed while
+        the message is constructed, so the message does not have to be
+        rendered to obtain an ETag.
+
+        ``compression`` is an optional content coding, either "gzip" or
+        "deflate". If given, primary payloads of at least
+        ``compressionThreshold`` bytes are compressed, marked with a
+        ``Content-Encoding`` header and base64 encoded.
+
+        ``store`` is an optional mapping, e.g. a dict or a BTree, used to
+        deduplicate binary payloads in bulk exports. A binary payload is put
+        in the store under its SHA-256 digest, unless it is there already,
+        and the message only contains a ``message/external-body`` reference
+        to it. Pass the same store to ``initializeObject()`` to read the
+        message again.
         """
 
     def renderMessage(message, mangleFromHeader=False):
@@ -64,20 +110,45 @@ class IMessageAPI(Interface):
         DEPRECATED. Use 'message.as_string()' instead.
         """
 
-    def initializeObjectFromSchema(context, schema, message, defaultCharset="utf-8"):
+    def initializeObjectFromSchema(
+        context,
+        schema,
+        message,
+        defaultCharset="utf-8",
+        digest=None,
+        trusted=False,
+        store=None,
+        limits=None,
+    ):
         """Convenience method which calls ``initializeObject()`` with all the
         fields, in order, of the given schema interface
         """
 
     def initializeObjectFromSchemata(
-        context, schemata, message, defaultCharset="utf-8"
+        context,
+        schemata,
+        message,
+        defaultCharset="utf-8",
+        digest=None,
+        trusted=False,
+        store=None,
+        limits=None,
     ):
         """Convenience method which calls ``initializeObject()`` with all the
         fields in order, of all the given schemata (a sequence of schema
         interfaces).
         """
 
-    def initializeObject(context, fields, message, defaultCharset="utf-8"):
+    def initializeObject(
+        context,
+        fields,
+        message,
+        defaultCharset="utf-8",
+        digest=None,
+        trusted=False,
+        store=None,
+        limits=None,
+    ):
         """Initialise an object from a message.
 
         ``context`` is the content object to initialise.
@@ -91,7 +162,28 @@ class IMessageAPI(Interface):
         ``defaultCharset`` is the default character set to use.
 
         If the message is a multipart message, the primary fields will be read
-        in order.
+        in order. Payloads with a ``Content-Encoding`` of "gzip" or "deflate"
+        are decompressed before they are demarshalled.
+
+        ``digest`` is an optional, previously stored ``Message-Digest`` value.
+        If the message carries the same digest, the object is left untouched
+        and nothing is demarshalled.
+
+        If ``trusted`` is true, the message is assumed to contain values which
+        were validated before, e.g. when restoring a backup. Marshalers
+        providing ``ITrustedFieldMarshaler`` will then set values without
+        validating them again. Safety checks are on by default.
+
+        ``store`` is the mapping the message was constructed with, if any.
+        Payloads which refer to it are read from it; a ``ValueError`` is
+        raised if the store is missing or does not contain the payload.
+
+        ``limits`` is an optional ``plone.rfc822.limits.ParseLimits``. The
+        message is checked against it before anything is demarshalled, and
+        each payload is checked again after decoding and while it is
+        decompressed. A ``ResourceLimitExceeded`` error is raised as soon as
+        a limit is crossed. Use ``plone.rfc822.limits.parseMessage()`` to
+        enforce the limits while the message is parsed, too.
         """
 
 
@@ -205,3 +297,52 @@ class IFieldMarshaler(Interface):
         Base64 encoding of the body. Base64 encoding is handled now by default
         in ``constructMessage``.
         """
+
+
+class ITrustedFieldMarshaler(IFieldMarshaler):
+    """A field marshaler which can skip validation for trusted input.
+
+    This is used by ``initializeObject()`` when it is called with
+    ``trusted=True``, e.g. to restore a backup which was validated when it
+    was exported.
+    """
+
+    def demarshalTrusted(
+        value, message=None, charset="utf-8", contentType=None, primary=False
+    ):
+        """Like demarshal(), but use ``decodeTrusted()`` to extract the value."""
+
+    def decodeTrusted(
+        value, message=None, charset="utf-8", contentType=None, primary=False
+    ):
+        """Like decode(), but do not validate the value against the field's
+        constraints.
+
+        Raise ValueError if the value cannot be extracted.
+        """
+
+
+class IStatelessFieldMarshaler(IFieldMarshaler):
+    """A field marshaler which reports whether a value is ASCII safe along
+    with the value, instead of setting its ``ascii`` attribute.
+
+    Such marshalers are not modified by marshalling, so one instance can be
+    used by several threads.
+    """
+
+    def marshalValue(charset="utf-8", primary=False):
+        """Like marshal(), but return a ``(value, ascii)`` tuple.
+
+        ``ascii`` has the meaning of the ``ascii`` attribute for this value.
+        """
+
+    def encodeValue(value, charset="utf-8", primary=False):
+        """Like encode(), but return a ``(value, ascii)`` tuple."""
+
+
+class IDefaultFieldMarshaler(IStatelessFieldMarshaler, ITrustedFieldMarshaler):
+    """Provided by the marshalers in ``plone.rfc822.defaultfields``.
+
+    This combines the optional marshaler interfaces into one, so that
+    marshalers can still be registered without an explicit ``provides``.
+    """
@@ -0,0 +1,252 @@
+"""Resource budgets for reading messages.
+
+A ``ParseLimits`` object sets upper bounds on the size of a message. Pass it
+to ``parseMessage()`` to stop reading a message as soon as a limit is
+crossed, and to ``initializeObject()`` to check a message before anything
+is demarshalled. Each limit raises its own subclass of
+``ResourceLimitExceeded``, and ``exceededLimits`` counts how often each of
+them was raised.
+"""
+
+from collections import Counter
+from email.feedparser import BytesFeedParser
+from email.parser import BytesHeaderParser
+from io import BytesIO
+
+# Number of times each limit was exceeded, by exception class name
+exceededLimits = Counter()
+
+# Size of the chunks read by ``parseMessage()``
+PARSE_CHUNK_SIZE = 64 * 1024
+
+
+class ResourceLimitExceeded(ValueError):
+    """A message exceeds one of the configured ``ParseLimits``"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        exceededLimits[self.__class__.__name__] += 1
+
+
+class TooManyHeaders(ResourceLimitExceeded):
+    """A message has more than ``maxHeaders`` headers"""
+
+
+class HeaderTooLong(ResourceLimitExceeded):
+    """A header is longer than ``maxHeaderLength``"""
+
+
+class HeadersTooLarge(ResourceLimitExceeded):
+    """The headers of a message are larger than ``maxHeaderBytes``"""
+
+
+class PayloadTooLarge(ResourceLimitExceeded):
+    """A message body or payload is larger than ``maxPayloadBytes``"""
+
+
+class TooManyParts(ResourceLimitExceeded):
+    """A multipart message has more than ``maxParts`` parts"""
+
+
+class ParseLimits:
+    """Upper bounds on the size of a message. None means unlimited.
+
+    ``maxHeaders`` is the number of headers of the message and of each part.
+
+    ``maxHeaderLength`` is the length of a single header, including its name
+    and any folding.
+
+    ``maxHeaderBytes`` is the size of the header block of the message and of
+    each part.
+
+    ``maxPayloadBytes`` is the size of the message body, and of each payload
+    after it has been decoded and decompressed.
+
+    ``maxParts`` is the number of parts of a multipart message.
+    """
+
+    def __init__(
+        self,
+        maxHeaders=None,
+        maxHeaderLength=None,
+        maxHeaderBytes=None,
+        maxPayloadBytes=None,
+        maxParts=None,
+    ):
+        self.maxHeaders = maxHeaders
+        self.maxHeaderLength = maxHeaderLength
+        self.maxHeaderBytes = maxHeaderBytes
+        self.maxPayloadBytes = maxPayloadBytes
+        self.maxParts = maxParts
+
+    def __repr__(self):
+        limits = ", ".join(
+            f"{name}={value!r}"
+            for name, value in vars(self).items()
+            if value is not None
+        )
+        return f"<ParseLimits {limits}>"
+
+    def checkHeader(self, length):
+        if self.maxHeaderLength is not None and length > self.maxHeaderLength:
+            raise HeaderTooLong(f"Header exceeds {self.maxHeaderLength} bytes")
+
+    def checkHeaderCount(self, count):
+        if self.maxHeaders is not None and count > self.maxHeaders:
+            raise TooManyHeaders(f"More than {self.maxHeaders} headers")
+
+    def checkHeaderBytes(self, size):
+        if self.maxHeaderBytes is not None and size > self.maxHeaderBytes:
+            raise HeadersTooLarge(f"Headers exceed {self.maxHeaderBytes} bytes")
+
+    def checkPayload(self, size):
+        if self.maxPayloadBytes is not None and size > self.maxPayloadBytes:
+            raise PayloadTooLarge(f"Payload exceeds {self.maxPayloadBytes} bytes")
+
+    def checkParts(self, count):
+        if self.maxParts is not None and count > self.maxParts:
+            raise TooManyParts(f"More than {self.maxParts} parts")
+
+    def checkHeaders(self, message):
+        """Check the headers of a parsed message or part"""
+        size = 0
+        for count, (name, value) in enumerate(message._headers, 1):
+            self.checkHeaderCount(count)
+            length = len(name) + 2 + len(value)
+            self.checkHeader(length)
+            size += length + 1
+            self.checkHeaderBytes(size)
+
+    def checkMessage(self, message):
+        """Check a parsed message, stopping at the first limit crossed.
+
+        Payloads are checked as they are received, i.e. before they are
+        decoded. ``initializeObject()`` checks the decoded payloads as well.
+        """
+        self.checkHeaders(message)
+        payload = message._payload
+        if isinstance(payload, list):
+            self.checkParts(len(payload))
+            for part in payload:
+                self.checkHeaders(part)
+                if isinstance(part._payload, str):
+                    self.checkPayload(len(part._payload))
+        elif payload is not None:
+            self.checkPayload(len(payload))
+
+
+class _HeaderScanner:
+    """Checks the header block of a message as it is read.
+
+    Only the new data is scanned for line ends. Of the current line, just
+    its length and first and last bytes are kept, so that a very long line
+    is not copied again with each chunk.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.size = 0
+        self.count = 0
+        self.current = 0
+        self.block = []
+        # the unfinished line
+        self.first = b""
+        self.last = b""
+        self.length = 0
+
+    def feed(self, data):
+        """Scan ``data``, returning the offset in it after the header block,
+        or None if the header block continues after it.
+        """
+        limits = self.limits
+        self.block.append(data)
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            length = self.length + end - start
+            first = self.first or data[start : start + 1]
+            last = data[end - 1 : end] if end > start else self.last
+            if last == b"\r":
+                length -= 1
+            self.first = self.last = b""
+            self.length = 0
+            start = end + 1
+            if not length:
+                # the blank line ends the header block
+                self.block[-1] = data[:start]
+                return start
+            if first in (b" ", b"\t") and self.count:
+                self.current += length + 1
+            else:
+                self.count += 1
+                limits.checkHeaderCount(self.count)
+                self.current = length
+            limits.checkHeader(self.current)
+            self.size += length + 1
+            limits.checkHeaderBytes(self.size)
+        if start < len(data):
+            self.first = self.first or data[start : start + 1]
+            self.last = data[-1:]
+            self.length += len(data) - start
+        # an unfinished line counts towards the limits too
+        limits.checkHeader(self.current + self.length)
+        limits.checkHeaderBytes(self.size + self.length)
+        return None
+
+
+def parseMessage(data, limits=None):
+    """Parse a message from bytes or a binary file, enforcing ``limits``.
+
+    The message is read in chunks, and reading stops with a
+    ``ResourceLimitExceeded`` error as soon as the header block, the number
+    of parts or the size of the body crosses a limit. Part headers and
+    payloads are checked once the message has been parsed.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = BytesIO(data)
+    if limits is None:
+        limits = ParseLimits()
+    parser = BytesFeedParser()
+    scanner = _HeaderScanner(limits)
+    delimiter = None
+    delimiters = 0
+    tail = b""
+    bodySize = 0
+
+    while True:
+        chunk = data.read(PARSE_CHUNK_SIZE)
+        if not chunk:
+            break
+        body = b""
+        if scanner is not None:
+            offset = scanner.feed(chunk)
+            if offset is not None:
+                headers = BytesHeaderParser().parsebytes(b"".join(scanner.block))
+                boundary = headers.get_boundary()
+                if boundary is not None and headers.get_content_maintype() == (
+                    "multipart"
+                ):
+                    delimiter = b"\n--" + boundary.encode("ascii", "replace")
+                # the body starts after the blank line, which we keep in order
+                # to find a delimiter at its very start
+                tail = b"\n"
+                body = chunk[offset:]
+                scanner = None
+        else:
+            body = chunk
+        if body:
+            bodySize += len(body)
+            limits.checkPayload(bodySize)
+            if delimiter is not None and limits.maxParts is not None:
+                # Count delimiter lines: a message with n parts has n + 1
+                window = tail + body
+                delimiters += window.count(delimiter)
+                tail = window[-(len(delimiter) - 1) :]
+                limits.checkParts(delimiters - 1)
+        parser.feed(chunk)
+
+    message = parser.close()
+    limits.checkMessage(message)
+    return message
@@ -0,0 +1,150 @@
+"""Lazy, read-only views of messages.
+
+A ``MessageProxy`` provides a schema, but rather than initialising an object
+from all headers and payloads of a message up front, like
+``initializeObject()`` does, it decodes each field the first time it is
+read.
+"""
+
+from plone.rfc822._utils import _decode_header_value
+from plone.rfc822._utils import _decode_payload_value
+from plone.rfc822._utils import _message_charset
+from plone.rfc822._utils import _payload_charset
+from plone.rfc822._utils import _primary_payloads
+from plone.rfc822._utils import _read_payload
+from plone.rfc822._utils import _split_fields
+from plone.rfc822.interfaces import IFieldMarshaler
+from plone.rfc822.interfaces import ITrustedFieldMarshaler
+from zope.component import queryMultiAdapter
+from zope.interface import directlyProvides
+from zope.schema import getFieldsInOrder
+
+import logging
+
+logger = logging.getLogger("plone.rfc822")
+
+_marker = object()
+
+
+class MessageProxy:
+    """A read-only object providing ``schema``, whose field values are read
+    from ``message``.
+
+    Each field is decoded with the registered ``IFieldMarshaler`` when it is
+    first accessed, and the value is kept for later accesses. Fields are
+    matched to headers and payloads as by ``initializeObject()``. A field
+    without a header, or which cannot be decoded, has its default value.
+    ``trusted`` and ``store`` have the same meaning as for
+    ``initializeObject()``.
+    """
+
+    def __init__(
+        self, message, schema, defaultCharset="utf-8", trusted=False, store=None
+    ):
+        self.__dict__["_message"] = message
+        self.__dict__["_schema"] = schema
+        self.__dict__["_fields"] = dict(getFieldsInOrder(schema))
+        self.__dict__["_defaultCharset"] = defaultCharset
+        self.__dict__["_trusted"] = trusted
+        self.__dict__["_store"] = store
+        directlyProvides(self, schema)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} for {self._schema.__identifier__}>"
+
+    def __getattr__(self, name):
+        field = self.__dict__.get("_fields", {}).get(name)
+        if field is None:
+            raise AttributeError(name)
+        if name in self._primary():
+            value = self._decodePayload(name, field)
+        else:
+            value = self._decodeHeader(name, field)
+        if value is _marker:
+            value = field.bind(self).default
+        self.__dict__[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        if name in self._fields:
+            raise AttributeError(f"{name} is read-only")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if name in self._fields:
+            raise AttributeError(f"{name} is read-only")
+        super().__delattr__(name)
+
+    # Helper methods
+
+    def _primary(self):
+        try:
+            return self.__dict__["_primaryFields"]
+        except KeyError:
+            primary = dict(_split_fields(self._fields.items())[1])
+            self.__dict__["_primaryFields"] = primary
+            return primary
+
+    def _headers(self):
+        try:
+            return self.__dict__["_headerValues"]
+        except KeyError:
+            headers = {}
+            for name, value in self._message.items():
+                headers.setdefault(name.lower(), value)
+            self.__dict__["_headerValues"] = headers
+            return headers
+
+    def _decode(self, name, field, value, **kwargs):
+        marshaler = queryMultiAdapter((self, field), IFieldMarshaler)
+        if marshaler is None:
+            logger.debug(f"No marshaler found for field {name} of {repr(self)}")
+            return _marker
+        if not value:
+            return field.missing_value
+        decode = marshaler.decode
+        if self._trusted and ITrustedFieldMarshaler.providedBy(marshaler):
+            decode = marshaler.decodeTrusted
+        try:
+            return decode(value, **kwargs)
+        except ValueError as e:
+            logger.debug(f"Decoding of {name} for {repr(self)} failed: {e}")
+            return _marker
+
+    def _decodeHeader(self, name, field):
+        value = self._headers().get(name.lower())
+        if value is None:
+            return _marker
+        charset = _message_charset(self._message, self._defaultCharset)
+        value, charset = _decode_header_value(value, charset)
+        return self._decode(
+            name,
+            field,
+            value,
+            message=self._message,
+            charset=charset,
+            contentType=self._message.get_content_type(),
+            primary=False,
+        )
+
+    def _decodePayload(self, name, field):
+        primary = list(self._primary().items())
+        try:
+            payloads = _primary_payloads(self, self._message, primary)
+            if not payloads:
+                return _marker
+            payload = payloads[list(self._primary()).index(name)]
+            value, contentType = _read_payload(payload, self._store)
+            value = _decode_payload_value(payload, value)
+        except ValueError as e:
+            logger.debug(f"Reading of {name} for {repr(self)} failed: {e}")
+            return _marker
+        return self._decode(
+            name,
+            field,
+            value,
+            message=payload,
+            charset=payload.get_content_charset(_payload_charset(self._message)),
+            contentType=contentType,
+            primary=True,
+        )
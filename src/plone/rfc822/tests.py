@@ -1,14 +1,58 @@
+from email import message_from_bytes
+from email.header import decode_header
+from email.header import Header
+from email.message import Message
+from plone.rfc822 import constructMessageFromSchema
+from plone.rfc822 import initializeObjectFromSchema
+from plone.rfc822._header import EncodedHeader
+from plone.rfc822._utils import _add_payload_to_message
 from plone.rfc822._utils import safe_native_string
+from plone.rfc822.defaultfields import ASCIISafeFieldMarshaler
+from plone.rfc822.defaultfields import BytesFieldMarshaler
+from plone.rfc822.defaultfields import DatetimeMarshaler
+from plone.rfc822.defaultfields import registerDefaultMarshalers
+from plone.rfc822.defaultfields import UnicodeValueFieldMarshaler
+from plone.rfc822.export import exportMessages
+from plone.rfc822.export import shardPath
+from plone.rfc822.ingest import mboxMessages
+from plone.rfc822.interfaces import IPrimaryField
 from plone.testing import layered
+from plone.testing import zca
 from plone.testing.zca import UNIT_TESTING
+from zope.component import adapter
+from zope.component import getGlobalSiteManager
+from zope.component import provideAdapter
+from zope.configuration import xmlconfig
+from zope.interface import alsoProvides
+from zope.interface import implementer
+from zope.interface import Interface
+from zope.interface.interface import InterfaceClass
+from zope.schema import Bytes
+from zope.schema import Text
+from zope.schema import TextLine
+from zope.schema.interfaces import IBytes
 
 import doctest
+import gc
+import hashlib
+import plone.rfc822
+import random
+import shutil
+import tempfile
+import tracemalloc
 import unittest
+import zope.component
 
 DOCFILES = [
     "message.rst",
     "fields.rst",
     "supermodel.rst",
+    "wire.rst",
+    "ingest.rst",
+    "proxy.rst",
+    "batch.rst",
+    "limits.rst",
+    "export.rst",
 ]
 
 optionflags = (
@@ -26,6 +70,295 @@ class TestUtils(unittest.TestCase):
         self.assertRaises(ValueError, safe_native_string, None)
 
 
+class TestEncodedHeader(unittest.TestCase):
+    values = [
+        "",
+        "T\xe4st",
+        "T\xe4st title||Another title||" * 20,
+        "\xd8" * 200,
+        "\u20ac \u4e2d\u6587 \U0001f600 " * 40,
+        "ascii only, but with an escaped\\nnewline " * 10,
+        "=?utf-8?q?not_an_encoded_word?= _ ? =" * 10,
+        "line\nbreaks\r\nare left to the stdlib \xe6",
+    ]
+
+    def test_same_as_header(self):
+        for value in self.values:
+            for charset in ("utf-8", "utf8", "UTF-8"):
+                for maxlinelen in (None, 0, 20, 40, 78, 200):
+                    self.assertEqual(
+                        EncodedHeader(value, charset).encode(maxlinelen=maxlinelen),
+                        Header(value, charset).encode(maxlinelen=maxlinelen),
+                        (value, charset, maxlinelen),
+                    )
+            self.assertEqual(
+                EncodedHeader(value, "utf-8").encode(linesep="\r\n"),
+                Header(value, "utf-8").encode(linesep="\r\n"),
+            )
+
+    def test_round_trip(self):
+        for value in self.values[1:-1]:
+            encoded = EncodedHeader(value, "utf-8").encode(maxlinelen=78)
+            decoded = b"".join(part for part, charset in decode_header(encoded))
+            self.assertEqual(decoded.decode("utf-8"), value)
+
+
+class TestRegisterDefaultMarshalers(unittest.TestCase):
+    def registrations(self, register):
+        zca.pushGlobalRegistry()
+        try:
+            register()
+            return {
+                (registration.required, registration.provided, registration.factory)
+                for registration in getGlobalSiteManager().registeredAdapters()
+            }
+        finally:
+            zca.popGlobalRegistry()
+
+    def test_same_as_zcml(self):
+        def loadZCML():
+            context = xmlconfig.file("meta.zcml", zope.component)
+            xmlconfig.file("configure.zcml", plone.rfc822, context=context)
+
+        registered = self.registrations(registerDefaultMarshalers)
+        self.assertEqual(len(registered), 19)
+        self.assertEqual(registered, self.registrations(loadZCML))
+
+
+class TestBaseFieldMarshaler(unittest.TestCase):
+    def test_assign_attributes(self):
+        class Context:
+            title = "Context"
+
+        class Other:
+            title = "Other"
+
+        context = Context()
+        for factory, ascii in [
+            (UnicodeValueFieldMarshaler, False),
+            (ASCIISafeFieldMarshaler, True),
+            (BytesFieldMarshaler, True),
+            (DatetimeMarshaler, True),
+        ]:
+            marshaler = factory(context, TextLine(__name__="title"))
+            self.assertEqual(marshaler.ascii, ascii)
+            marshaler.ascii = not ascii
+            self.assertEqual(marshaler.ascii, not ascii)
+
+            field = TextLine(__name__="title", missing_value="missing")
+            marshaler.field = field
+            self.assertIs(marshaler.field, field)
+            marshaler.instance = Other()
+            self.assertEqual(marshaler._query(), "Other")
+            marshaler.demarshal("")
+            self.assertEqual(marshaler.instance.title, "missing")
+            self.assertEqual(context.title, "Context")
+
+
+class IExportContent(Interface):
+    title = TextLine()
+    body = Text()
+
+
+alsoProvides(IExportContent["body"], IPrimaryField)
+
+
+@implementer(IExportContent)
+class ExportContent:
+    def __init__(self, index):
+        self.title = f"Item {index}"
+        self.body = f"Caf\xe9 menu {index}"
+
+
+def loadExportContents():
+    registerDefaultMarshalers()
+    return [ExportContent(index) for index in range(10)]
+
+
+class TestExportMessages(unittest.TestCase):
+    def test_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        exported = exportMessages(
+            loadExportContents, [IExportContent], directory, shards=3, processes=2
+        )
+        self.assertEqual(exported, 10)
+        messages = [
+            message_from_bytes(data)
+            for shard in range(3)
+            for index, data in mboxMessages(shardPath(directory, shard), mboxrd=True)
+        ]
+        self.assertEqual(
+            [message["title"] for message in messages],
+            [f"Item {index}" for index in range(10)],
+        )
+        # mbox messages end with a newline
+        self.assertEqual(
+            [message.get_payload(decode=True).decode("utf-8") for message in messages],
+            [f"Caf\xe9 menu {index}\n" for index in range(10)],
+        )
+
+
+class IMemoryContent(Interface):
+    title = TextLine()
+    data = Bytes()
+
+
+class ITextContent(Interface):
+    title = TextLine()
+    body = Text()
+
+
+alsoProvides(IMemoryContent["data"], IPrimaryField)
+alsoProvides(ITextContent["body"], IPrimaryField)
+
+
+@implementer(IMemoryContent)
+class MemoryContent:
+    title = "Test"
+    body = None
+    data = None
+
+
+@adapter(MemoryContent, IBytes)
+class BinaryMarshaler(BytesFieldMarshaler):
+    """Marshals bytes as binary data, like a file field would"""
+
+    __slots__ = ()
+
+    ascii = False
+
+    def getCharset(self, default="utf-8"):
+        return None
+
+    def getContentType(self):
+        return "application/octet-stream"
+
+
+class TestMemory(unittest.TestCase):
+    """Bounds on the memory used to construct and parse messages.
+
+    The bounds on the peak memory are relative to the size of the payload,
+    and leave less room than a further copy of it would take. For messages
+    with many headers, the peak memory and the number of blocks retained
+    after the call are bounded per header. Temporary objects which are
+    freed again before the peak are not counted.
+    """
+
+    size = 1024 * 1024
+    headers = 200
+
+    def setUp(self):
+        zca.pushGlobalRegistry()
+        self.addCleanup(zca.popGlobalRegistry)
+        registerDefaultMarshalers()
+        provideAdapter(BinaryMarshaler)
+        self.data = random.Random(0).randbytes(self.size)
+
+    def traced(self, func):
+        """Call ``func`` while tracing memory allocations, and return its
+        result, the peak memory allocated and the number of blocks it
+        allocated which are still retained afterwards. It is called once
+        before, to fill any caches.
+        """
+        func()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = func()
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        retained = sum(stat.count for stat in snapshot.statistics("filename"))
+        return result, peak, retained
+
+    def assertPeakBelow(self, func, ratio):
+        result, peak, retained = self.traced(func)
+        self.assertLess(peak, ratio * self.size, f"{peak / self.size:.2f}x")
+        return result
+
+    def binaryContent(self):
+        content = MemoryContent()
+        content.data = self.data
+        return content
+
+    def test_construct_binary(self):
+        # the base64 text is 1.35x the data, and is built from chunks
+        content = self.binaryContent()
+        message = self.assertPeakBelow(
+            lambda: constructMessageFromSchema(content, IMemoryContent), 3.0
+        )
+        self.assertEqual(message["Content-Transfer-Encoding"], "base64")
+
+    def test_add_payload_to_message(self):
+        content = self.binaryContent()
+        primary = [("data", IMemoryContent["data"])]
+
+        def addPayload():
+            message = Message()
+            _add_payload_to_message(
+                content, message, primary, "utf-8", hashlib.sha256()
+            )
+            return message
+
+        message = self.assertPeakBelow(addPayload, 3.0)
+        self.assertIn("Content-Digest", message)
+
+    def test_initialize_binary(self):
+        message = message_from_bytes(
+            constructMessageFromSchema(self.binaryContent(), IMemoryContent).as_bytes()
+        )
+        content = MemoryContent()
+
+        def initialize():
+            initializeObjectFromSchema(content, IMemoryContent, message)
+
+        self.assertPeakBelow(initialize, 1.5)
+        self.assertEqual(content.data, self.data)
+
+    def test_text(self):
+        # the marshaler encodes the text, which is decoded for the payload
+        content = MemoryContent()
+        content.body = "x" * self.size
+        message = self.assertPeakBelow(
+            lambda: constructMessageFromSchema(content, ITextContent), 2.5
+        )
+        message = message_from_bytes(message.as_bytes())
+        content = MemoryContent()
+
+        def initialize():
+            initializeObjectFromSchema(content, ITextContent, message)
+
+        self.assertPeakBelow(initialize, 2.5)
+        self.assertEqual(content.body, "x" * self.size)
+
+    def test_memory_per_header(self):
+        schema = InterfaceClass(
+            "IManyFields",
+            attrs={f"field{index}": TextLine() for index in range(self.headers)},
+        )
+        context = MemoryContent()
+        for index in range(self.headers):
+            setattr(context, f"field{index}", f"Value {index}")
+
+        # the message retains a name, a value and a tuple per header
+        message, peak, retained = self.traced(
+            lambda: constructMessageFromSchema(context, schema)
+        )
+        self.assertLess(retained / self.headers, 5, "retained blocks per header")
+        self.assertLess(peak / self.headers, 400, "peak bytes per header")
+
+        # the object retains the value of each field
+        message = message_from_bytes(message.as_bytes())
+        content = MemoryContent()
+        _, peak, retained = self.traced(
+            lambda: initializeObjectFromSchema(content, schema, message)
+        )
+        self.assertLess(retained / self.headers, 5, "retained blocks per header")
+        self.assertLess(peak / self.headers, 800, "peak bytes per header")
+
+
 def test_suite():
     suite = unittest.TestSuite()
     suite.addTests(
@@ -41,4 +374,10 @@ def test_suite():
         ]
     )
     suite.addTest(TestUtils("test_safe_native_string"))
+    suite.addTest(TestEncodedHeader("test_same_as_header"))
+    suite.addTest(TestEncodedHeader("test_round_trip"))
+    suite.addTest(TestRegisterDefaultMarshalers("test_same_as_zcml"))
+    suite.addTest(TestBaseFieldMarshaler("test_assign_attributes"))
+    suite.addTest(TestExportMessages("test_processes"))
+    suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(TestMemory))
     return suite
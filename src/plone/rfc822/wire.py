@@ -0,0 +1,317 @@
+"""Compact binary wire format.
+
+This is an alternative to the RFC 822 messages built by ``constructMessage()``
+for replication between systems which both use plone.rfc822. It uses the
+same ``IFieldMarshaler`` adapters and the same split into headers and primary
+payloads, but stores them as length-prefixed records:
+
+* header values are stored as UTF-8, without folding, RFC 2047 encoding or
+  newline escaping;
+* payloads are stored as raw bytes, without base64 encoding.
+
+The layout is (all integers are unsigned and big-endian)::
+
+    message  := MAGIC headers body
+    headers  := count:u32 (name-length:u16 name value-length:u32 value)*
+    body     := 0                                  no payload
+              | 1 length:u64 bytes                 single payload
+              | 2 count:u32 (headers body)*        multipart
+
+Use ``messageToWire()`` and ``wireToMessage()`` to convert between the two
+formats.
+"""
+
+from email.message import Message
+from plone.rfc822._header import EncodedHeader
+from plone.rfc822._utils import _as_bytes
+from plone.rfc822._utils import _decode_header_value
+from plone.rfc822._utils import _decoded_payload
+from plone.rfc822._utils import _demarshal_headers
+from plone.rfc822._utils import _demarshal_payload
+from plone.rfc822._utils import _digest_matches
+from plone.rfc822._utils import _encode_base64
+from plone.rfc822._utils import _is_store_reference
+from plone.rfc822._utils import _marshal
+from plone.rfc822._utils import _marshal_header
+from plone.rfc822._utils import _read_payload
+from plone.rfc822._utils import _split_fields
+from plone.rfc822._utils import CONTENT_ENCODING_HEADER
+from plone.rfc822.interfaces import IFieldMarshaler
+from plone.rfc822.interfaces import IPrimaryField
+from zope.component import queryMultiAdapter
+
+import logging
+import struct
+
+logger = logging.getLogger("plone.rfc822")
+
+MAGIC = b"RFC822W\x01"
+
+_NO_PAYLOAD = 0
+_PAYLOAD = 1
+_MULTIPART = 2
+
+_u8 = struct.Struct(">B")
+_u16 = struct.Struct(">H")
+_u32 = struct.Struct(">I")
+_u64 = struct.Struct(">Q")
+
+
+def _pack_headers(chunks, headers):
+    chunks.append(_u32.pack(len(headers)))
+    for name, value in headers:
+        name = name.encode("ascii")
+        value = value.encode("utf-8", "surrogateescape")
+        chunks.append(_u16.pack(len(name)))
+        chunks.append(name)
+        chunks.append(_u32.pack(len(value)))
+        chunks.append(value)
+
+
+def _pack_body(chunks, body):
+    if body is None:
+        chunks.append(_u8.pack(_NO_PAYLOAD))
+    elif isinstance(body, list):
+        chunks.append(_u8.pack(_MULTIPART))
+        chunks.append(_u32.pack(len(body)))
+        for headers, part_body in body:
+            _pack_headers(chunks, headers)
+            _pack_body(chunks, part_body)
+    else:
+        chunks.append(_u8.pack(_PAYLOAD))
+        chunks.append(_u64.pack(len(body)))
+        chunks.append(body)
+
+
+def _pack(headers, body):
+    chunks = [MAGIC]
+    _pack_headers(chunks, headers)
+    _pack_body(chunks, body)
+    return b"".join(chunks)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.view = memoryview(data)
+        self.offset = 0
+
+    def read(self, length):
+        start = self.offset
+        self.offset += length
+        if self.offset > len(self.view):
+            raise ValueError("Truncated wire message")
+        return self.view[start : self.offset]
+
+    def unpack(self, fmt):
+        return fmt.unpack(self.read(fmt.size))[0]
+
+    def headers(self):
+        headers = []
+        for _ in range(self.unpack(_u32)):
+            name = str(self.read(self.unpack(_u16)), "ascii")
+            value = str(self.read(self.unpack(_u32)), "utf-8", "surrogateescape")
+            headers.append((name, value))
+        return headers
+
+    def body(self, nested=False):
+        kind = self.unpack(_u8)
+        if kind == _NO_PAYLOAD:
+            return None
+        if kind == _PAYLOAD:
+            return self.read(self.unpack(_u64)).tobytes()
+        if kind == _MULTIPART and not nested:
+            return [
+                (self.headers(), self.body(nested=True))
+                for _ in range(self.unpack(_u32))
+            ]
+        raise ValueError(f"Invalid payload kind {kind} in wire message")
+
+
+def _unpack(data):
+    if bytes(data[: len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a wire message")
+    reader = _Reader(data)
+    reader.offset = len(MAGIC)
+    headers = reader.headers()
+    body = reader.body()
+    if reader.offset != len(reader.view):
+        raise ValueError("Trailing data after wire message")
+    return headers, body
+
+
+def _header_message(headers):
+    """Build a payload-less message holding ``headers`` as they are"""
+    message = Message()
+    for name, value in headers:
+        message[name] = value
+    return message
+
+
+def constructWireMessage(context, fields, charset="utf-8"):
+    """Construct a wire message from the given fields of ``context``.
+
+    This is the counterpart of ``constructMessage()``, see ``IMessageAPI``.
+    """
+    headers = []
+    parts = []
+
+    for name, field in fields:
+        if IPrimaryField.providedBy(field):
+            marshaler = queryMultiAdapter((context, field), IFieldMarshaler)
+            if marshaler is None:
+                continue
+            value = _marshal(marshaler, charset, True)[0]
+            if value is None:
+                continue
+            part = Message()
+            content_type = marshaler.getContentType()
+            if content_type is not None:
+                part.set_type(content_type)
+            part_charset = marshaler.getCharset(charset)
+            if part_charset is not None:
+                part.set_param("charset", part_charset)
+            marshaler.postProcessMessage(part)
+            parts.append((part.items(), _as_bytes(value, part_charset)))
+            continue
+        marshaled = _marshal_header(context, name, field, charset)
+        if marshaled is not None:
+            headers.append((name, marshaled[0]))
+
+    if not parts:
+        body = None
+    elif len(parts) == 1:
+        part_headers, body = parts[0]
+        headers.extend(part_headers)
+    else:
+        body = parts
+    return _pack(headers, body)
+
+
+def initializeObjectFromWireMessage(
+    context, fields, data, defaultCharset="utf-8", digest=None, trusted=False
+):
+    """Initialise ``context`` from a wire message.
+
+    This is the counterpart of ``initializeObject()``, see ``IMessageAPI``.
+    """
+    headers, body = _unpack(data)
+    message = _header_message(headers)
+    if digest is not None and _digest_matches(message, digest):
+        logger.debug(f"Message digest unchanged for {repr(context)}, skipping")
+        return
+
+    charset = message.get_param("charset")
+    charset = str(charset) if charset is not None else defaultCharset
+    header_fields, primary = _split_fields(fields)
+    _demarshal_headers(context, header_fields, message, charset, trusted)
+
+    if not body:
+        return
+    if isinstance(body, list):
+        payloads = [
+            (_header_message(part_headers), part_body)
+            for part_headers, part_body in body
+        ]
+    else:
+        if len(primary) != 1:
+            raise ValueError(
+                "Got a single payload for wire message, but no primary "
+                "fields found for %s" % repr(context)
+            )
+        payloads = [(message, body)]
+    if len(payloads) != len(primary):
+        raise ValueError(
+            "Got %d payloads for wire message, but %s primary fields "
+            "found for %s" % (len(payloads), len(primary), repr(context))
+        )
+    for (name, field), (payload, payload_value) in zip(primary, payloads):
+        _demarshal_payload(
+            context, name, field, payload, payload_value or b"", "utf-8", trusted
+        )
+
+
+def _wire_headers(message):
+    headers = []
+    for name, value in message.items():
+        if name.lower() == "content-transfer-encoding":
+            continue
+        value, charset = _decode_header_value(value, "utf-8")
+        if isinstance(value, bytes):
+            value = value.decode(charset or "utf-8", "surrogateescape")
+        headers.append((name, value))
+    return headers
+
+
+def _wire_part(part, store):
+    """Return the wire headers and the body of a part, resolving a reference
+    to ``store`` into the value it refers to.
+    """
+    if not _is_store_reference(part):
+        return _wire_headers(part), _decoded_payload(part)
+    body, content_type = _read_payload(part, store)
+    # the content type of the value is in the headers of the phantom body
+    phantom = part.get_payload(0)
+    headers = [
+        (name, phantom["Content-Type"] if name.lower() == "content-type" else value)
+        for name, value in _wire_headers(part)
+    ]
+    return headers, body
+
+
+def messageToWire(message, store=None):
+    """Convert a message built by ``constructMessage()`` to a wire message.
+
+    Payloads which refer to a store are read from ``store``, as with
+    ``initializeObject()``. A ``ValueError`` is raised if there is no store
+    or the payload is not in it.
+    """
+    if _is_store_reference(message):
+        headers, body = _wire_part(message, store)
+        return _pack(headers, body)
+    if message.is_multipart():
+        body = [_wire_part(part, store) for part in message.get_payload()]
+    elif message.get_payload():
+        body = _decoded_payload(message)
+    else:
+        body = None
+    return _pack(_wire_headers(message), body)
+
+
+def _set_header(message, name, value):
+    if value.isascii() and "\n" not in value:
+        message[name] = value
+    else:
+        # see https://tools.ietf.org/html/rfc2822#section-3.2.2
+        message[name] = EncodedHeader(value.replace("\n", r"\n"), "utf-8")
+
+
+def _set_payload(message, value):
+    charset = message.get_content_charset()
+    if CONTENT_ENCODING_HEADER not in message:
+        if charset is not None:
+            message.set_payload(value.decode(charset))
+            return
+        if value.isascii():
+            message.set_payload(value.decode("ascii"))
+            return
+    _encode_base64(message, value)
+
+
+def wireToMessage(data):
+    """Convert a wire message to an RFC 822 message"""
+    headers, body = _unpack(data)
+    message = Message()
+    for name, value in headers:
+        _set_header(message, name, value)
+    if isinstance(body, list):
+        if message.get("Content-Type") is None:
+            message.set_type("multipart/mixed")
+        for part_headers, part_body in body:
+            part = Message()
+            for name, value in part_headers:
+                _set_header(part, name, value)
+            _set_payload(part, part_body or b"")
+            message.attach(part)
+    elif body is not None:
+        _set_payload(message, body)
+    return message
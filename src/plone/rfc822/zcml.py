@@ -0,0 +1,20 @@
+"""The ``<rfc822:defaultMarshalers />`` ZCML directive."""
+
+from plone.rfc822.defaultfields import DEFAULT_MARSHALERS
+from zope.component.zcml import adapter
+from zope.interface import Interface
+
+
+class IDefaultMarshalersDirective(Interface):
+    """Register the default field marshalers"""
+
+
+def defaultMarshalers(_context):
+    """Register the adapters in ``DEFAULT_MARSHALERS``, as
+    ``registerDefaultMarshalers()`` does.
+
+    Each adapter is registered with its own ``<adapter />`` action, so that
+    conflicts and overrides are resolved as if they had been listed in ZCML.
+    """
+    for factory, required in DEFAULT_MARSHALERS:
+        adapter(_context, [factory], for_=required)